@@ -1,6 +1,9 @@
 from util.result_check import io_mock, mock_io, timeit, timeits, time_complexity, evaluate_via_io
+from util.result_check import benchmark, BenchmarkResult, mock_io_many
 from util.result_check import ext_binary_to_func, compare_func_result, compare_func_results, lprun, timeit_lp
-from util.prob_generate import generate_probs, merge_to_lines, list_to_string, random_choices
+from util.result_check import sample_profile
+from util.prob_generate import generate_probs, generate_prob, merge_to_lines, list_to_string, random_choices
+from util.prob_generate import write_lines, sample_partial, sample_range, reservoir_sample, AliasTable
 from util.cc_tools import eprint
 
 
@@ -9,16 +12,26 @@ __all__ = [
     'evaluate_via_io',
     'io_mock',
     'mock_io',
+    'mock_io_many',
     'timeit',
     'timeits',
+    'benchmark',
+    'BenchmarkResult',
     'timeit_lp',
     'lprun',
+    'sample_profile',
     'time_complexity',
     'compare_func_result',
     'compare_func_results',
     'generate_probs',
+    'generate_prob',
     'ext_binary_to_func',
     'merge_to_lines',
     'list_to_string',
+    'write_lines',
     'random_choices',
+    'sample_partial',
+    'sample_range',
+    'reservoir_sample',
+    'AliasTable',
 ]
@@ -0,0 +1,201 @@
+"""benchmark 결과를 json lines 로 쌓아두고, 실행 사이의 유의미한 성능 저하를 찾는다
+
+usage: python -m util.benchmark_history <history_file> [--func FUNC] [--threshold 0.05] [--alpha 0.05]
+       regression 이 있으면 exit code 1 로 끝난다 (배포 gate 용)
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import math
+import os
+import pickle
+import re
+import subprocess
+import sys
+from dataclasses import dataclass
+from typing import List, Optional
+
+from util.tools import make_parent_dir
+
+
+@dataclass
+class BenchmarkComparison:
+    func: str
+    args_fingerprint: str
+    old_git_rev: str
+    new_git_rev: str
+    old_median: float
+    new_median: float
+    p_value: float
+    is_regression: bool
+
+    @property
+    def ratio(self):
+        return self.new_median / self.old_median if self.old_median else math.inf
+
+    def to_msg(self):
+        mark = 'REGRESSION' if self.is_regression else 'ok'
+        return (f'[{mark}] {self.func}({self.args_fingerprint}) {self.old_git_rev} -> {self.new_git_rev}: '
+                f'median {self.old_median:.3g}s -> {self.new_median:.3g}s (x{self.ratio:.3f}, p={self.p_value:.3g})')
+
+
+def func_name(func) -> str:
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def args_fingerprint(func_args, args_key=None) -> str:
+    """실행이 달라도 같은 인자면 같은 값, repr 은 객체 주소나 numpy 의 생략(...)이 들어가므로 pickle 한 bytes 를 hash 한다
+
+    pickle 할 수 없는 인자는 repr 에서 주소를 지워서 쓴다. 구별이 어렵거나 인자가 크면 args_key 로 직접 이름을 준다.
+    """
+    if args_key is not None:
+        return str(args_key)
+    try:
+        data = pickle.dumps(_canonical(func_args), protocol=4)
+    except Exception:
+        data = re.sub(r' at 0x[0-9a-fA-F]+', '', repr(func_args)).encode('utf8')
+    return hashlib.sha1(data).hexdigest()[:16]
+
+
+_CONTAINER_TYPES = {list, tuple, dict, set, frozenset}
+
+
+def _canonical(obj):
+    """set 의 pickle 결과는 원소의 hash 순서 (str 은 실행마다 다름) 를 따르므로 정렬된 tuple 로 바꾼다
+
+    set 이 없는 list, tuple, dict 는 원소를 하나씩 보지 않고 그대로 돌려준다.
+    """
+    obj_type = type(obj)
+    if obj_type in (set, frozenset):
+        return obj_type.__name__, tuple(sorted(pickle.dumps(_canonical(x), protocol=4) for x in obj))
+    elif obj_type in (list, tuple):
+        if _CONTAINER_TYPES.isdisjoint(map(type, obj)):
+            return obj
+        return obj_type(map(_canonical, obj))
+    elif obj_type is dict:
+        if _CONTAINER_TYPES.isdisjoint(map(type, obj)) and _CONTAINER_TYPES.isdisjoint(map(type, obj.values())):
+            return obj
+        return {_canonical(k): _canonical(v) for k, v in obj.items()}
+    return obj
+
+
+def get_git_rev(path='.') -> str:
+    """path 가 속한 git repository 의 HEAD (uncommitted 변경이 있으면 -dirty), git 이 아니면 ''"""
+    cwd = path if os.path.isdir(path) else os.path.dirname(os.path.abspath(path))
+    try:
+        rev = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=cwd, stderr=subprocess.DEVNULL)
+        status = subprocess.check_output(['git', 'status', '--porcelain', '-uno'], cwd=cwd, stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+    return rev.decode().strip() + ('-dirty' if status.strip() else '')
+
+
+def record_benchmark(history_file, func, func_args, result, changed='', git_rev=None, args_key=None) -> dict:
+    """benchmark result (BenchmarkResult) 를 history_file 에 한 줄로 추가한다, args_key 는 args_fingerprint 참고"""
+    record = {
+        'time': str(datetime.datetime.now()),
+        'func': func_name(func),
+        'args_fingerprint': args_fingerprint(func_args, args_key=args_key),
+        'git_rev': get_git_rev(history_file) if git_rev is None else git_rev,
+        'changed': changed,
+        'wall_times': result.wall_times,
+        'cpu_times': result.cpu_times,
+        'peak_memory': result.peak_memory,
+    }
+    make_parent_dir(history_file)
+    with open(history_file, 'a') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    return record
+
+
+def load_benchmark_history(history_file, func=None, fingerprint=None) -> List[dict]:
+    """func 는 함수 또는 func_name 문자열"""
+    name = func if func is None or isinstance(func, str) else func_name(func)
+    records = []
+    with open(history_file) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if name is not None and record['func'] != name:
+                continue
+            if fingerprint is not None and record['args_fingerprint'] != fingerprint:
+                continue
+            records.append(record)
+    return records
+
+
+def compare_benchmark_records(old, new, threshold=0.05, alpha=0.05) -> BenchmarkComparison:
+    """new 가 old 보다 느린지 단측 Mann-Whitney U 검정으로 본다
+
+    p_value < alpha 이고 median 이 (1 + threshold) 배 넘게 늘었을 때만 regression 으로 본다.
+    """
+    old_median = _median(old['wall_times'])
+    new_median = _median(new['wall_times'])
+    p_value = _mann_whitney_greater_p(new['wall_times'], old['wall_times'])
+    return BenchmarkComparison(
+        func=new['func'],
+        args_fingerprint=new['args_fingerprint'],
+        old_git_rev=old['git_rev'],
+        new_git_rev=new['git_rev'],
+        old_median=old_median,
+        new_median=new_median,
+        p_value=p_value,
+        is_regression=p_value < alpha and new_median > old_median * (1 + threshold),
+    )
+
+
+def check_regressions(history_file, func=None, threshold=0.05, alpha=0.05) -> List[BenchmarkComparison]:
+    """(func, args_fingerprint) 별로 마지막 두 기록을 비교한다"""
+    latest = {}
+    for record in load_benchmark_history(history_file, func=func):
+        key = (record['func'], record['args_fingerprint'])
+        latest[key] = (latest[key][1] if key in latest else None, record)
+    return [compare_benchmark_records(old, new, threshold=threshold, alpha=alpha)
+            for old, new in latest.values() if old is not None]
+
+
+def _median(xs):
+    xs = sorted(xs)
+    mid = len(xs) // 2
+    return xs[mid] if len(xs) % 2 else (xs[mid - 1] + xs[mid]) / 2
+
+
+def _mann_whitney_greater_p(xs, ys) -> float:
+    """H1: xs 가 ys 보다 크다, 정규 근사 p-value (동률은 평균 순위)"""
+    n1, n2 = len(xs), len(ys)
+    if not n1 or not n2:
+        return 1.
+    values = sorted([(x, 0) for x in xs] + [(y, 1) for y in ys])
+    rank_sum = 0.
+    i = 0
+    while i < len(values):
+        j = i
+        while j < len(values) and values[j][0] == values[i][0]:
+            j += 1
+        avg_rank = (i + 1 + j) / 2
+        rank_sum += avg_rank * sum(1 for k in range(i, j) if values[k][1] == 0)
+        i = j
+    u = rank_sum - n1 * (n1 + 1) / 2
+    sd = math.sqrt(n1 * n2 * (n1 + n2 + 1) / 12)
+    z = (u - n1 * n2 / 2) / sd
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='compare the last two benchmark records of each function')
+    parser.add_argument('history_file')
+    parser.add_argument('--func', default=None, help='module.qualname')
+    parser.add_argument('--threshold', type=float, default=0.05)
+    parser.add_argument('--alpha', type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    comparisons = check_regressions(args.history_file, func=args.func, threshold=args.threshold, alpha=args.alpha)
+    for comparison in comparisons:
+        print(comparison.to_msg())
+    return 1 if any(comparison.is_regression for comparison in comparisons) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,98 +1,216 @@
 
+from array import array
+from itertools import chain
+from mmap import mmap
 from operator import add
 
+try:
+    import numpy as np
+except ImportError:     # numpy is optional, only needed for storage='numpy'
+    np = None
+
+
+def _make_storage(values, storage=None, typecode='q'):
+    if storage is None or storage == 'list':
+        return list(values)
+    elif storage == 'array':
+        return array(typecode, values)
+    elif storage == 'numpy':
+        if np is None:
+            raise ImportError('numpy is required for storage="numpy"')
+        return np.array(values, dtype=typecode)
+    else:
+        raise ValueError(f'Unknown storage: {storage}')
+
 
 class SegmentTree:
-    def __init__(self, xs, acc_func=add, init=0):
-        def build(v, il, ir):
-            if il == ir:
-                self.tree[v] = xs[il]
-            else:
-                im = (il + ir) // 2
-                self.tree[v] = self.acc_func(build(v * 2 + 1, il, im), build(v * 2 + 2, im + 1, ir))
-            return self.tree[v]
+    """bottom-up segment tree over a power-of-two layout
 
+    leaves live at tree[size:size + n] and tree[v] = acc_func(tree[2v], tree[2v + 1]).
+    storage: None(list), 'array' or 'numpy', the latter two only fit numeric monoids which match typecode.
+    """
+
+    def __init__(self, xs, acc_func=add, init=0, storage=None, typecode='q'):
         self.acc_func = acc_func
         self.init = init
         self.n = len(xs)
-        self.tree = [0] * (self.n * 4)   # rough max
-        build(0, 0, self.n - 1)
+        self.size = 1 << max(self.n - 1, 0).bit_length()
+        tree = [init] * self.size + list(xs) + [init] * (self.size - self.n)
+        for v in range(self.size - 1, 0, -1):
+            tree[v] = acc_func(tree[2 * v], tree[2 * v + 1])
+        self.tree = _make_storage(tree, storage, typecode)
 
     def get_range_value(self, left, right):
-        def get_value(v, il, ir):
-            if il >= left and ir <= right:
-                return self.tree[v]
-            elif il > right or ir < left:
-                return self.init
-            else:
-                im = (il + ir) // 2
-                return self.acc_func(get_value(v * 2 + 1, il, im), get_value(v * 2 + 2, im + 1, ir))
-        return get_value(0, 0, self.n - 1)
+        acc_func = self.acc_func
+        tree = self.tree
+        acc_left = acc_right = self.init
+        left += self.size
+        right += self.size + 1
+        while left < right:
+            if left & 1:
+                acc_left = acc_func(acc_left, tree[left])
+                left += 1
+            if right & 1:
+                right -= 1
+                acc_right = acc_func(tree[right], acc_right)
+            left >>= 1
+            right >>= 1
+        return acc_func(acc_left, acc_right)
+
+    def query_many(self, ranges):
+        """[(left, right), ...] -> [get_range_value(left, right), ...]"""
+        get_range_value = self.get_range_value
+        return [get_range_value(left, right) for left, right in ranges]
 
     def update(self, idx, diff):
-        def _update(v, il, ir):
-            if il == idx and ir == idx:
-                self.tree[v] += diff
-            elif il <= idx <= ir:
-                im = (il + ir) // 2
-                self.tree[v] = self.acc_func(_update(v * 2 + 1, il, im), _update(v * 2 + 2, im + 1, ir))
-            return self.tree[v]
-        _update(0, 0, self.n - 1)
-
-
-class SegmentTreeLazy:
-    def __init__(self, xs):
-        def build(v, il, ir):
-            if il == ir:
-                self.tree[v] = xs[il]
-            else:
-                im = (il + ir) // 2
-                self.tree[v] = build(v * 2 + 1, il, im) + build(v * 2 + 2, im + 1, ir)
-            return self.tree[v]
-
+        acc_func = self.acc_func
+        tree = self.tree
+        v = idx + self.size
+        tree[v] += diff
+        v >>= 1
+        while v:
+            tree[v] = acc_func(tree[2 * v], tree[2 * v + 1])
+            v >>= 1
+
+    def update_many(self, idxs, diffs):
+        """apply all leaf diffs first, then recompute each touched parent only once per level"""
+        idxs = list(idxs)   # read twice, idxs may be an iterator
+        acc_func = self.acc_func
+        tree = self.tree
+        size = self.size
+        for idx, diff in zip(idxs, diffs):
+            tree[idx + size] += diff
+        vs = {(idx + size) >> 1 for idx in idxs}
+        while vs and 0 not in vs:
+            for v in vs:
+                tree[v] = acc_func(tree[2 * v], tree[2 * v + 1])
+            vs = {v >> 1 for v in vs}
+
+
+class SegmentTreeLazyGeneric:
+    """lazy segment tree over (op, e) monoid with (mapping, composition, id_map) operators, like AtCoder lazy_segtree
+
+    mapping(f, x) applies f to an aggregated value, composition(f, g) means f after g.
+    updates push/pull iteratively along the boundary paths, reads never touch self.tree and self.lazy.
+    """
+
+    def __init__(self, xs, op, e, mapping, composition, id_map):
+        self.op = op
+        self.e = e
+        self.mapping = mapping
+        self.composition = composition
+        self.id_map = id_map
         self.n = len(xs)
-        self.tree = [0] * (self.n * 4)   # rough max
-        self.lazy = [0] * (self.n * 4)   # rough max
-        build(0, 0, self.n - 1)
+        self.log = max(self.n - 1, 0).bit_length()
+        self.size = 1 << self.log
+        self.tree = [e] * self.size + list(xs) + [e] * (self.size - self.n)
+        self.lazy = [id_map] * self.size     # leaves have no lazy
+        for v in range(self.size - 1, 0, -1):
+            self._pull(v)
+
+    def get_value(self, idx):
+        composition = self.composition
+        v = idx + self.size
+        f = self.id_map
+        for i in range(self.log, 0, -1):
+            f = composition(f, self.lazy[v >> i])
+        return self.mapping(f, self.tree[v])
+
+    def set_value(self, idx, x):
+        v = idx + self.size
+        for i in range(self.log, 0, -1):
+            self._push(v >> i)
+        self.tree[v] = x
+        for i in range(1, self.log + 1):
+            self._pull(v >> i)
 
     def get_range_value(self, left, right):
-        def get_value(v, il, ir, lazy):
-            self.lazy[v] += lazy
-            if il >= left and ir <= right:
-                return self.tree[v] + self.lazy[v] * (ir - il + 1)
-            elif il > right or ir < left:
-                return 0
+        op, mapping, composition = self.op, self.mapping, self.composition
+        tree, lazy = self.tree, self.lazy
+        hi = right + 1
+        acc = self.e
+        # (v, il, ir, pending), pending is the composed lazy of all ancestors of v
+        stack = [(1, 0, self.size, self.id_map)]
+        while stack:
+            v, il, ir, f = stack.pop()
+            if ir <= left or hi <= il:
+                continue
+            if left <= il and ir <= hi:
+                acc = op(acc, mapping(f, tree[v]))
             else:
+                f = composition(f, lazy[v])
                 im = (il + ir) // 2
-                cur_lazy = self.lazy[v]
-                self.tree[v] += cur_lazy * (ir - il + 1)
-                self.lazy[v] = 0
-                ll = get_value(v * 2 + 1, il, im, cur_lazy)
-                rr = get_value(v * 2 + 2, im + 1, ir, cur_lazy)
-                return ll + rr
+                stack.append((v * 2 + 1, im, ir, f))
+                stack.append((v * 2, il, im, f))
+        return acc
 
-        return get_value(0, 0, self.n - 1, 0)
+    def range_update(self, left, right, f):
+        left += self.size
+        right += self.size + 1
+        for i in range(self.log, 0, -1):
+            if ((left >> i) << i) != left:
+                self._push(left >> i)
+            if ((right >> i) << i) != right:
+                self._push((right - 1) >> i)
+
+        il, ir = left, right
+        while il < ir:
+            if il & 1:
+                self._apply(il, f)
+                il += 1
+            if ir & 1:
+                ir -= 1
+                self._apply(ir, f)
+            il >>= 1
+            ir >>= 1
+
+        for i in range(1, self.log + 1):
+            if ((left >> i) << i) != left:
+                self._pull(left >> i)
+            if ((right >> i) << i) != right:
+                self._pull((right - 1) >> i)
+
+    def _pull(self, v):
+        self.tree[v] = self.op(self.tree[2 * v], self.tree[2 * v + 1])
+
+    def _apply(self, v, f):
+        self.tree[v] = self.mapping(f, self.tree[v])
+        if v < self.size:
+            self.lazy[v] = self.composition(f, self.lazy[v])
+
+    def _push(self, v):
+        f = self.lazy[v]
+        self._apply(2 * v, f)
+        self._apply(2 * v + 1, f)
+        self.lazy[v] = self.id_map
+
+
+class SegmentTreeLazy(SegmentTreeLazyGeneric):
+    """range add / range sum, each node keeps (sum, length)"""
 
-    def range_update(self, left, right, diff):
-        def _update(v, il, ir):
-            if il >= left and ir <= right:
-                self.lazy[v] += diff
-            elif il > right or ir < left:
-                pass
-            else:
-                self.tree[v] += diff * (min(right, ir) - max(left, il) + 1)
-                im = (il + ir) // 2
-                _update(v * 2 + 1, il, im)
-                _update(v * 2 + 2, im + 1, ir)
+    def __init__(self, xs):
+        super().__init__(
+            [(x, 1) for x in xs],
+            op=lambda x, y: (x[0] + y[0], x[1] + y[1]),
+            e=(0, 0),
+            mapping=lambda f, x: (x[0] + f * x[1], x[1]),
+            composition=add,
+            id_map=0,
+        )
 
-        return _update(0, 0, self.n - 1)
+    def get_range_value(self, left, right):
+        return super().get_range_value(left, right)[0]
 
 
 class FenwickTree:
-    def __init__(self, xs):
-        self.tree = [0] * (len(xs) + 1)
-        for i in range(1, len(xs) + 1):
-            self._update(i, xs[i - 1])
+    def __init__(self, xs, storage=None, typecode='q'):
+        tree = [0] + list(xs)
+        n = len(xs)
+        for i in range(1, n + 1):
+            j = i + (i & -i)
+            if j <= n:
+                tree[j] += tree[i]
+        self.tree = _make_storage(tree, storage, typecode)
 
     def get_range_value(self, left, right):
         return self._sum(right + 1) - self._sum(left)
@@ -100,28 +218,234 @@ class FenwickTree:
     def update(self, idx, diff):
         self._update(idx + 1, diff)
 
+    def lower_bound(self, target):
+        """smallest idx with sum(xs[:idx + 1]) >= target (len(xs) if not exist), every xs must be non-negative"""
+        tree = self.tree
+        n = len(tree) - 1
+        pos = 0
+        step = 1 << n.bit_length() >> 1
+        while step:
+            nxt = pos + step
+            if nxt <= n and tree[nxt] < target:
+                pos = nxt
+                target -= tree[nxt]
+            step >>= 1
+        return pos
+
     def _sum(self, idx):
+        tree = self.tree
         acc = 0
         while idx > 0:
-            acc += self.tree[idx]
+            acc += tree[idx]
             idx &= idx - 1
         return acc
 
     def _update(self, idx, diff):
-        tree_size = len(self.tree)
+        tree = self.tree
+        tree_size = len(tree)
         while idx < tree_size:
-            self.tree[idx] += diff
+            tree[idx] += diff
             idx += (idx & -idx)
 
 
+class FenwickTreeRangeUpdate:
+    """range update / range sum with two FenwickTree, sum(xs[:i]) = sum1(i) * i - sum2(i)"""
+
+    def __init__(self, xs, storage=None, typecode='q'):
+        self.tree1 = FenwickTree([0] * len(xs), storage=storage, typecode=typecode)
+        self.tree2 = FenwickTree([-x for x in xs], storage=storage, typecode=typecode)
+
+    def get_range_value(self, left, right):
+        return self._prefix_sum(right + 1) - self._prefix_sum(left)
+
+    def range_update(self, left, right, diff):
+        self.tree1._update(left + 1, diff)
+        self.tree1._update(right + 2, -diff)
+        self.tree2._update(left + 1, diff * left)
+        self.tree2._update(right + 2, -diff * (right + 1))
+
+    def update(self, idx, diff):
+        self.range_update(idx, idx, diff)
+
+    def _prefix_sum(self, idx):
+        return self.tree1._sum(idx) * idx - self.tree2._sum(idx)
+
+
+class FenwickTree2D:
+    """2D FenwickTree on a flat (R + 1) * (C + 1) storage"""
+
+    def __init__(self, matrix, storage=None, typecode='q'):
+        self.R = R = len(matrix)
+        self.C = C = len(matrix[0]) if matrix else 0
+        width = C + 1
+        tree = [0] * ((R + 1) * width)
+        for r, row in enumerate(matrix, 1):
+            tree[r * width + 1:(r + 1) * width] = row
+        for r in range(1, R + 1):
+            base = r * width
+            for c in range(1, C + 1):
+                nc = c + (c & -c)
+                if nc <= C:
+                    tree[base + nc] += tree[base + c]
+        for r in range(1, R + 1):
+            nr = r + (r & -r)
+            if nr <= R:
+                base, nbase = r * width, nr * width
+                for c in range(1, C + 1):
+                    tree[nbase + c] += tree[base + c]
+        self.tree = _make_storage(tree, storage, typecode)
+
+    def get_range_value(self, r1, c1, r2, c2):
+        """sum of matrix[r1:r2 + 1][c1:c2 + 1]"""
+        return (self._sum(r2 + 1, c2 + 1) - self._sum(r1, c2 + 1)
+                - self._sum(r2 + 1, c1) + self._sum(r1, c1))
+
+    def update(self, r, c, diff):
+        tree = self.tree
+        width = self.C + 1
+        r += 1
+        while r <= self.R:
+            cc = c + 1
+            while cc <= self.C:
+                tree[r * width + cc] += diff
+                cc += (cc & -cc)
+            r += (r & -r)
+
+    def _sum(self, r, c):
+        tree = self.tree
+        width = self.C + 1
+        acc = 0
+        while r > 0:
+            cc = c
+            while cc > 0:
+                acc += tree[r * width + cc]
+                cc &= cc - 1
+            r &= r - 1
+        return acc
+
+
+################################################################################
+# NumPy backend, batched updates / queries as whole arrays
+################################################################################
+
+class FenwickTreeNumpy:
+    """FenwickTree that updates and queries index arrays level by level (log n vectorized steps)"""
+
+    def __init__(self, xs, dtype='q'):
+        if np is None:
+            raise ImportError('numpy is required for FenwickTreeNumpy')
+        self.n = n = len(xs)
+        self.tree = tree = np.zeros(n + 1, dtype=dtype)
+        tree[1:] = xs
+        k = 1
+        while k <= n:
+            idxs = np.arange(k, n + 1, 2 * k)
+            parents = idxs + k
+            mask = parents <= n
+            tree[parents[mask]] += tree[idxs[mask]]
+            k *= 2
+
+    def get_range_value(self, left, right):
+        return self.get_range_values([left], [right])[0]
+
+    def get_range_values(self, lefts, rights):
+        return self.prefix_sums(np.asarray(rights) + 1) - self.prefix_sums(lefts)
+
+    def prefix_sums(self, idxs):
+        """[sum(xs[:idx]) for idx in idxs]"""
+        tree = self.tree
+        idxs = np.array(idxs, dtype=np.int64)
+        acc = np.zeros(len(idxs), dtype=tree.dtype)
+        while idxs.any():
+            acc += tree[idxs]     # tree[0] is always 0
+            idxs &= idxs - 1
+        return acc
+
+    def update(self, idx, diff):
+        self.update_many([idx], [diff])
+
+    def update_many(self, idxs, diffs):
+        tree = self.tree
+        idxs = np.asarray(idxs, dtype=np.int64) + 1
+        diffs = np.asarray(diffs, dtype=tree.dtype)
+        while idxs.size:
+            np.add.at(tree, idxs, diffs)
+            idxs = idxs + (idxs & -idxs)
+            mask = idxs <= self.n
+            idxs, diffs = idxs[mask], diffs[mask]
+
+
+class SegmentTreeNumpy:
+    """SegmentTree for numpy ufunc monoids (np.add, np.minimum, np.maximum ...) with vectorized batch APIs"""
+
+    def __init__(self, xs, ufunc=None, init=0, dtype=None):
+        if np is None:
+            raise ImportError('numpy is required for SegmentTreeNumpy')
+        self.ufunc = ufunc or np.add
+        self.init = init
+        self.n = len(xs)
+        self.size = size = 1 << max(self.n - 1, 0).bit_length()
+        dtype = dtype or np.result_type(np.asarray(xs), init)
+        self.tree = tree = np.full(2 * size, init, dtype=dtype)
+        tree[size:size + self.n] = xs
+        lo, hi = size // 2, size
+        while lo:
+            tree[lo:hi] = self.ufunc(tree[2 * lo:2 * hi:2], tree[2 * lo + 1:2 * hi:2])
+            lo, hi = lo // 2, lo
+
+    def get_range_value(self, left, right):
+        return self.query_many([(left, right)])[0]
+
+    def query_many(self, ranges):
+        ranges = np.asarray(ranges, dtype=np.int64).reshape(-1, 2)
+        return self.get_range_values(ranges[:, 0], ranges[:, 1])
+
+    def get_range_values(self, lefts, rights):
+        ufunc, tree = self.ufunc, self.tree
+        lefts = np.asarray(lefts, dtype=np.int64) + self.size
+        rights = np.asarray(rights, dtype=np.int64) + self.size + 1
+        acc_left = np.full(len(lefts), self.init, dtype=tree.dtype)
+        acc_right = acc_left.copy()
+        while (lefts < rights).any():
+            mask = (lefts < rights) & (lefts & 1 == 1)
+            acc_left[mask] = ufunc(acc_left[mask], tree[lefts[mask]])
+            lefts += mask
+            mask = (lefts < rights) & (rights & 1 == 1)
+            rights -= mask
+            acc_right[mask] = ufunc(tree[rights[mask]], acc_right[mask])
+            lefts >>= 1
+            rights >>= 1
+        return ufunc(acc_left, acc_right)
+
+    def update(self, idx, diff):
+        self.update_many([idx], [diff])
+
+    def update_many(self, idxs, diffs):
+        """add diffs to leaves, then recompute the touched parents level by level"""
+        ufunc, tree = self.ufunc, self.tree
+        vs = np.asarray(idxs, dtype=np.int64) + self.size
+        np.add.at(tree, vs, diffs)
+        vs = np.unique(vs >> 1)
+        while vs.size and vs[0]:
+            tree[vs] = ufunc(tree[2 * vs], tree[2 * vs + 1])
+            vs = np.unique(vs >> 1)
+
+
 ################################################################################
 # KMP
 ################################################################################
 
 class KMP:
+    """KMP matcher over any sequence (str, bytes, bytearray, memoryview, mmap)
+
+    feed / search_stream keep the matched state across chunks and report absolute offsets.
+    with bytes-like text the pattern must be bytes-like too, elements are compared as ints.
+    """
+
     def __init__(self, ptn):
         self.ptn = ptn
         self.table = self.make_partial_match_table(ptn)
+        self.reset()
 
     @staticmethod
     def make_partial_match_table(ptn):
@@ -136,16 +460,117 @@ class KMP:
         return table
 
     def search(self, txt):
-        ptn = self.ptn
+        ptn, table = self.ptn, self.table
+        ptn_len = len(ptn)
         j = 0
-        for i, c in enumerate(txt):
+        for i, c in enumerate(_iter_elements(txt)):
             while ptn[j] != c and j > 0:
-                j = self.table[j-1]
+                j = table[j-1]
             if ptn[j] == c:
                 j += 1
-                if j == len(ptn):
+                if j == ptn_len:
                     yield i - j + 1
-                    j = self.table[j - 1]
+                    j = table[j - 1]
+
+    def reset(self):
+        self.state = 0      # matched length of ptn at the end of fed text
+        self.offset = 0     # absolute offset of the next chunk
+
+    def feed(self, chunk):
+        """search chunk continuing from the previously fed chunks, return absolute start offsets"""
+        ptn, table = self.ptn, self.table
+        ptn_len = len(ptn)
+        j = self.state
+        base = self.offset - ptn_len + 1
+        matches = []
+        for i, c in enumerate(_iter_elements(chunk)):
+            while ptn[j] != c and j > 0:
+                j = table[j-1]
+            if ptn[j] == c:
+                j += 1
+                if j == ptn_len:
+                    matches.append(base + i)
+                    j = table[j - 1]
+        self.state = j
+        self.offset += len(chunk)
+        return matches
+
+    def search_stream(self, chunks):
+        self.reset()
+        for chunk in chunks:
+            yield from self.feed(chunk)
+
+    def search_file(self, file_path, chunk_size=1 << 20):
+        """search a (binary) file chunk by chunk, memory is bounded by chunk_size"""
+        with open(file_path, 'rb') as f:
+            yield from self.search_stream(iter(lambda: f.read(chunk_size), b''))
+
+
+class KMPAutomaton(KMP):
+    """KMP compiled into a full DFA, (state x symbol) -> state, one table lookup per input byte
+
+    only bytes-like patterns are supported. input bytes are mapped to compact symbols by bytes.translate
+    (bytes of ptn -> 1..k, the others -> 0), so the table is (len(ptn) + 1) x (k + 1) whatever the alphabet.
+    """
+    BLOCK_SIZE = 1 << 20
+
+    def __init__(self, ptn):
+        if isinstance(ptn, str):
+            raise TypeError('KMPAutomaton only supports bytes-like pattern')
+        ptn = bytes(ptn)
+        super().__init__(ptn)
+        symbols = sorted(set(ptn))
+        trans_table = bytearray(256)
+        for sym, byte in enumerate(symbols, 1):
+            trans_table[byte] = sym
+        self.trans_table = bytes(trans_table)
+        self.dfa = self.make_dfa(ptn.translate(self.trans_table), len(symbols) + 1)
+
+    @staticmethod
+    def make_dfa(sym_ptn, num_symbols):
+        """dfa[state][sym], state == len(sym_ptn) means matched (and continues for overlapping matches)"""
+        dfa = [[0] * num_symbols for _ in range(len(sym_ptn) + 1)]
+        if sym_ptn:
+            dfa[0][sym_ptn[0]] = 1
+        fallback = 0
+        for state in range(1, len(sym_ptn) + 1):
+            dfa[state][:] = dfa[fallback]
+            if state < len(sym_ptn):
+                dfa[state][sym_ptn[state]] = state + 1
+                fallback = dfa[fallback][sym_ptn[state]]
+        return dfa
+
+    def search(self, txt):
+        state = 0
+        for start in range(0, len(txt), self.BLOCK_SIZE):
+            matches, state = self._scan(txt[start:start + self.BLOCK_SIZE], state, start)
+            yield from matches
+
+    def feed(self, chunk):
+        matches, self.state = self._scan(chunk, self.state, self.offset)
+        self.offset += len(chunk)
+        return matches
+
+    def _scan(self, chunk, state, offset):
+        dfa = self.dfa
+        ptn_len = len(self.ptn)
+        base = offset - ptn_len + 1
+        matches = []
+        for i, sym in enumerate(bytes(chunk).translate(self.trans_table)):
+            state = dfa[state][sym]
+            if state == ptn_len:
+                matches.append(base + i)
+        return matches, state
+
+
+def _iter_elements(txt, block_size=1 << 20):
+    """mmap iterates as 1-byte bytes, so iterate it as ints through bytes blocks
+
+    no memoryview is exported, so the mmap can be closed even if the iteration stops early.
+    """
+    if isinstance(txt, mmap):
+        return chain.from_iterable(txt[start:start + block_size] for start in range(0, len(txt), block_size))
+    return txt
 
 
 ################################################################################
@@ -1,12 +1,16 @@
+import io
+import math
+import multiprocessing
 import random
-from typing import Iterable
+from itertools import islice
+from typing import Iterable, Sequence
 
 
 ################################################################################
 # Problem Generate
 ################################################################################
 
-def generate_probs(func, args=None, count=1, random_state=None):
+def generate_probs(func, args=None, count=1, random_state=None, pass_rng=False, workers=None, chunksize=1):
     """generate input strings by func
 
     example of func:
@@ -19,19 +23,70 @@ def generate_probs(func, args=None, count=1, random_state=None):
             N,
             merge_to_lines(X),
         ])
+
+    :param pass_rng: func(*args, rng=random.Random(case_seed(random_state, case_index))) 로 호출한다.
+        case 마다 seed 가 정해지므로 generate_prob 로 어떤 case 든 따로 다시 만들 수 있다
+    :param workers: 주어지면 process pool 에서 case 들을 만들고, 순서는 case_index 순으로 유지한다.
+        pass_rng 가 아니면 worker 에서 case 마다 전역 random 을 같은 방식으로 seed 한다
     """
     args = args or []
 
-    if random_state:
-        random.seed(random_state)
+    if not pass_rng and not workers:
+        if random_state:
+            random.seed(random_state)
+
+        for _ in range(count):
+            yield _to_prob_tuple(func(*args))
+        return
+
+    seed = random_state if random_state is not None else random.getrandbits(32)
+    if workers and workers > 1:
+        with multiprocessing.Pool(workers, initializer=_init_generate_worker,
+                                  initargs=(func, args, seed, pass_rng)) as pool:
+            yield from pool.imap(_generate_worker, range(count), chunksize=chunksize)
+    else:
+        for case_index in range(count):
+            yield generate_prob(func, args, seed, case_index, pass_rng=pass_rng)
 
-    for _ in range(count):
+
+def generate_prob(func, args, random_state, case_index, pass_rng=True):
+    """generate_probs(..., random_state=random_state) 의 case_index 번째 case 만 다시 만든다"""
+    seed = case_seed(random_state, case_index)
+    if pass_rng:
+        prob = func(*args, rng=random.Random(seed))
+    else:
+        random.seed(seed)
         prob = func(*args)
-        # In case of generated input string for stdin, it may be a string type.
-        # Strictly it is not correct type, but for convenience we convert this to a tuple.
-        if isinstance(prob, str):
-            prob = (prob, )
-        yield prob
+    return _to_prob_tuple(prob)
+
+
+def case_seed(random_state, case_index) -> str:
+    """(random_state, case_index) 마다 다른 seed, str 은 sha512 로 seed 되므로 실행과 상관없이 같은 값이다
+
+    random_state 는 random.seed 가 받는 int, str, bytes 모두 된다.
+    """
+    return f'{random_state!r}:{case_index}'
+
+
+def _to_prob_tuple(prob):
+    # In case of generated input string for stdin, it may be a string type.
+    # Strictly it is not correct type, but for convenience we convert this to a tuple.
+    if isinstance(prob, str):
+        prob = (prob, )
+    return prob
+
+
+_worker_setting = None
+
+
+def _init_generate_worker(func, args, random_state, pass_rng):
+    global _worker_setting
+    _worker_setting = (func, args, random_state, pass_rng)
+
+
+def _generate_worker(case_index):
+    func, args, random_state, pass_rng = _worker_setting
+    return generate_prob(func, args, random_state, case_index, pass_rng=pass_rng)
 
 
 def merge_to_lines(args):
@@ -48,11 +103,152 @@ def merge_to_lines(args):
 
 
 def list_to_string(ints):
-    return ' '.join(str(i) for i in ints)
+    if hasattr(ints, 'tolist'):     # numpy array
+        ints = ints.tolist()
+    return ' '.join(map(str, ints))
+
+
+def write_lines(args, file, chunk_size=1 << 16, encoding='utf8'):
+    """merge_to_lines(args) 와 같은 내용을 중간 문자열 없이 file 에 바로 쓴다
+
+    긴 list/1차원 array 는 chunk_size 개씩 잘라서 쓰고, 2차원 numpy array 는 행마다 한 줄로 chunk_size 행씩 쓴다.
+    :param file: 파일 경로, text file, binary file (io.BytesIO 등) 모두 된다
+    """
+    if not hasattr(file, 'write'):
+        with open(file, 'w', encoding=encoding) as f:
+            return write_lines(args, f, chunk_size=chunk_size)
+
+    if isinstance(file, io.TextIOBase):
+        write = file.write
+    else:
+        def write(s):
+            file.write(s.encode(encoding))
+
+    for i, arg in enumerate(args):
+        if i:
+            write('\n')
+        if isinstance(arg, str):
+            write(arg)
+        elif getattr(arg, 'ndim', None) == 2:
+            for start in range(0, len(arg), chunk_size):
+                if start:
+                    write('\n')
+                write('\n'.join(' '.join(map(str, row)) for row in arg[start:start + chunk_size].tolist()))
+        elif isinstance(arg, Iterable):
+            _write_list(write, arg, chunk_size)
+        else:
+            write(str(arg))
+
 
+def _write_list(write, xs, chunk_size):
+    if hasattr(xs, 'tolist'):
+        # 전체를 python int list 로 바꾸지 않고, chunk 로 자른 뒤 바꾼다
+        for start in range(0, len(xs), chunk_size):
+            if start:
+                write(' ')
+            write(' '.join(map(str, xs[start:start + chunk_size].tolist())))
+        return
 
-def random_choices(xs, k=None):
+    it = iter(xs)
+    chunk = list(islice(it, chunk_size))
+    first = True
+    while chunk:
+        if not first:
+            write(' ')
+        write(' '.join(map(str, chunk)))
+        first = False
+        chunk = list(islice(it, chunk_size))
+
+
+def random_choices(xs, k=None, rng=None):
+    """xs 에서 서로 다른 k 개를 섞어서 고른다
+
+    rng 가 없으면 전역 random 을 예전과 같은 만큼 쓴다 (seed 한 결과가 바뀌지 않도록 list 로 만들어 shuffle 한다).
+    rng 가 주어지고 xs 가 sequence (range 포함) 이면 복사 없이 O(k) 로 뽑는다.
+    """
     k = k or len(xs)
+    if rng is not None and isinstance(xs, Sequence) and k < len(xs):
+        return sample_partial(xs, k, rng)
     xs = list(xs)
-    random.shuffle(xs)
+    (rng or random).shuffle(xs)
     return xs[:k]
+
+
+################################################################################
+# Sampling, 모두 rng (random.Random 또는 random 모듈) 를 명시적으로 받는다
+################################################################################
+
+def sample_partial(xs, k, rng):
+    """xs (len, index 가 되는 sequence) 에서 서로 다른 위치의 k 개를 뽑는다, partial Fisher-Yates
+
+    swap 한 위치만 dict 에 기록하므로 xs 를 복사하지 않고 O(k) 시간, 메모리로 동작한다. range 도 된다.
+    """
+    n = len(xs)
+    if not 0 <= k <= n:
+        raise ValueError(f'k must be in [0, {n}]: {k}')
+    swapped = {}
+    res = []
+    for i in range(k):
+        j = rng.randrange(i, n)
+        res.append(xs[swapped.get(j, j)])
+        swapped[j] = swapped.get(i, i)
+    return res
+
+
+def sample_range(start, stop, k, rng):
+    """range(start, stop) 에서 서로 다른 정수 k 개, range 를 만들지 않는다 (stop - start 가 10^18 이어도 된다)"""
+    return sample_partial(range(start, stop), k, rng)
+
+
+def reservoir_sample(iterable, k, rng):
+    """길이를 모르는 iterable 에서 k 개를 균등하게 뽑는다 (Algorithm L, 건너뛸 개수를 한 번에 뽑는다)"""
+    it = iter(iterable)
+    reservoir = list(islice(it, k))
+    if len(reservoir) < k or k == 0:
+        return reservoir
+
+    w = math.exp(math.log(rng.random()) / k)
+    while True:
+        skip = math.floor(math.log(rng.random()) / math.log(1 - w))
+        item = next(islice(it, skip, skip + 1), _END)
+        if item is _END:
+            return reservoir
+        reservoir[rng.randrange(k)] = item
+        w *= math.exp(math.log(rng.random()) / k)
+
+
+_END = object()
+
+
+class AliasTable:
+    """weights 에 비례하는 index sampling, 한 번 O(n) 으로 만들고 sample 하나당 O(1) (Vose's alias method)"""
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = sum(weights)
+        if n == 0 or total <= 0:
+            raise ValueError('weights must be non-empty with a positive sum')
+        probs = [w * n / total for w in weights]
+        self.prob = [1.] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(probs) if p < 1]
+        large = [i for i, p in enumerate(probs) if p >= 1]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = probs[s]
+            self.alias[s] = l
+            probs[l] -= 1 - probs[s]
+            (small if probs[l] < 1 else large).append(l)
+
+    def sample(self, rng):
+        i = rng.randrange(len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+    def samples(self, k, rng):
+        prob, alias = self.prob, self.alias
+        n = len(prob)
+        res = []
+        for _ in range(k):
+            i = rng.randrange(n)
+            res.append(i if rng.random() < prob[i] else alias[i])
+        return res
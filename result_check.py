@@ -1,16 +1,32 @@
 from unittest.mock import patch
-from io import StringIO
+from io import StringIO, BytesIO, TextIOWrapper
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
 import time
 import datetime
+import gc
+import math
+import multiprocessing
 import os
+import queue
+import signal
+import statistics
 import subprocess
-from typing import List, Callable, Iterable
+import sys
+import threading
+import tracemalloc
+from typing import List, Callable, Iterable, Optional
 
 from deprecation import deprecated
 from line_profiler import LineProfiler
 
+from util.benchmark_history import record_benchmark
 from util.cc_tools import eprint, get_caller_filename
 from util.prob_generate import list_to_string, merge_to_lines
+from util.tools import text_write
 
 MAX_LOOP = 10 ** 8
 BINARY_DIR_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../ext_code')
@@ -29,7 +45,7 @@ def logging_profile_info(msg_list, log_file_name):
 
 
 def timeit_lp(func, func_args, funcs=None, num_iter=100, time_limit=0.1, log=False,
-              silence=False, log_file_name=None, changed='', omit_func_args=False):
+              silence=False, log_file_name=None, changed='', omit_func_args=False, history_file=None, args_key=None):
     """execute timeit and line profiling
 
     :param func:
@@ -38,21 +54,30 @@ def timeit_lp(func, func_args, funcs=None, num_iter=100, time_limit=0.1, log=Fal
     :param num_iter:
     :param time_limit:
     :param silence: Dot not display stats by stderr
-    :param log: additionally logging stats into log_file
+    :param log: additionally logging stats into log_file, and benchmark record into history_file
     :param log_file_name: if log_file_name is not given, default value is caller's `filename.lprof`
     :param changed:
     :param omit_func_args:
+    :param history_file: json lines benchmark history (see util.benchmark_history),
+        if history_file is not given, default value is caller's `filename.bench.jsonl`
+    :param args_key: explicit name of func_args in the history instead of the hashed fingerprint
     """
-    timeit_msg = timeit(func, func_args, num_iter=num_iter, time_limit=time_limit, return_msg=True, silence=silence)
+    result = benchmark(func, func_args, num_iter=num_iter, time_limit=time_limit)
+    timeit_msg = result.to_msg()
+    if not silence:
+        eprint(timeit_msg)
     lp_msg = lprun(func, func_args, funcs=funcs, return_msg=True, silence=silence)
     if log:
-        log_file_name = log_file_name or get_caller_filename() + '.lprof'
+        caller_filename = get_caller_filename()
+        log_file_name = log_file_name or caller_filename + '.lprof'
         logging_profile_info([
             ('changed', changed),
             ('args', repr(func_args) if not omit_func_args else ''),
             ('timeit', timeit_msg),
             ('line_profiler', lp_msg),
         ], log_file_name)
+        record_benchmark(history_file or caller_filename + '.bench.jsonl', func, func_args, result, changed=changed,
+                         args_key=args_key)
 
 
 def lprun(func, args, funcs=None, silence=False, return_msg=False):
@@ -75,82 +100,742 @@ def lprun(func, args, funcs=None, silence=False, return_msg=False):
         return msg
 
 
-def timeit(func, func_args, num_iter=100, time_limit=0.1, silence=False, return_msg=False):
-    elapse_times = _calc_elapse_times(func, func_args, num_iter=num_iter, time_limit=time_limit)
-    msg = make_elapse_time_msg(elapse_times)
+@dataclass
+class SampleProfile:
+    """sample_profile 결과, stacks 는 {(root code, ..., leaf code): sample 수}"""
+    stacks: Counter
+    interval: float
+    funcs_by_code: dict = field(default_factory=dict)
+
+    @property
+    def num_samples(self):
+        return sum(self.stacks.values())
+
+    def collapsed(self) -> str:
+        """flamegraph.pl, speedscope 등이 읽는 collapsed stack 형식 ('a;b;c 12' 줄들)"""
+        return '\n'.join(f'{";".join(map(_code_label, stack))} {count}'
+                         for stack, count in sorted(self.stacks.items(), key=lambda item: -item[1]))
+
+    def top_functions(self, n=10):
+        """[(code, inclusive samples, self samples), ...] inclusive 순"""
+        inclusive, self_samples = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            for code in set(stack):
+                inclusive[code] += count
+            self_samples[stack[-1]] += count
+        return [(code, count, self_samples[code]) for code, count in inclusive.most_common(n)]
+
+    def suggest_lprun_funcs(self, n=5):
+        """lprun(funcs=...) 에 바로 넘길 수 있는 함수 객체들 (root 는 제외)
+
+        sample 마다 stack 에서 함수 객체를 찾을 수 있는 가장 깊은 frame 에 시간을 주고, 많은 순으로 고른다.
+        """
+        hot = Counter()
+        for stack, count in self.stacks.items():
+            for code in reversed(stack[1:]):
+                if code in self.funcs_by_code:
+                    hot[code] += count
+                    break
+        return [self.funcs_by_code[code] for code, _ in hot.most_common(n)]
+
+    def to_msg(self, n=10):
+        total = self.num_samples or 1
+        lines = [f'==> {self.num_samples} samples (interval: {_to_time_str(self.interval)})',
+                 f'{"inclusive":>10} {"self":>10}  function']
+        for code, inclusive, self_count in self.top_functions(n):
+            lines.append(f'{inclusive / total:>10.1%} {self_count / total:>10.1%}  {_code_label(code)}')
+        suggested = [func.__qualname__ for func in self.suggest_lprun_funcs()]
+        lines.append(f'==> suggested lprun funcs: [{", ".join(suggested)}]')
+        return '\n'.join(lines)
+
+
+def sample_profile(func, args, interval=0.001, mode='thread', silence=False, collapsed_file=None) -> SampleProfile:
+    """func(*args) 실행 중 call stack 을 주기적으로 sampling 한다, line_profiler 보다 overhead 가 훨씬 작다
+
+    :param mode: 'thread' 는 별도 thread 가 sys._current_frames 로 stack 을 읽는다 (wall time 기준).
+        'signal' 은 SIGPROF (ITIMER_PROF) handler 에서 읽는다 (cpu time 기준, main thread 에서만)
+    :param collapsed_file: 주어지면 flamegraph 용 collapsed stack 을 저장한다
+    """
+    args = _norm_func_args(args)
+    stacks = Counter()
+    funcs_by_code = {}
+    globals_by_code = {}
+
+    def record(frame):
+        stack = []
+        while frame is not None and frame.f_code is not run_code:
+            code = frame.f_code
+            if code not in globals_by_code:
+                globals_by_code[code] = frame.f_globals
+            stack.append(code)
+            frame = frame.f_back
+        if frame is not None and stack:
+            stacks[tuple(reversed(stack))] += 1
+
+    def run():
+        func(*args)
+    run_code = run.__code__
+
+    if mode == 'thread':
+        main_thread_id = threading.get_ident()
+        done = threading.Event()
+
+        def sampler():
+            while not done.wait(interval):
+                frame = sys._current_frames().get(main_thread_id)
+                if frame is not None:
+                    record(frame)
+
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(switch_interval, interval))
+        sampler_thread = threading.Thread(target=sampler, daemon=True)
+        sampler_thread.start()
+        try:
+            run()
+        finally:
+            done.set()
+            sampler_thread.join()
+            sys.setswitchinterval(switch_interval)
+    elif mode == 'signal':
+        prev_handler = signal.signal(signal.SIGPROF, lambda signum, frame: record(frame))
+        signal.setitimer(signal.ITIMER_PROF, interval, interval)
+        try:
+            run()
+        finally:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            signal.signal(signal.SIGPROF, prev_handler)
+    else:
+        raise ValueError(f'Unknown mode: {mode}')
+
+    for code, f_globals in globals_by_code.items():
+        func = _find_func_by_qualname(code, f_globals)
+        if func is not None:
+            funcs_by_code[code] = func
+    unresolved = [code for code in globals_by_code if code not in funcs_by_code]
+    if unresolved:
+        # nested function 처럼 이름으로 찾을 수 없는 것은 code 를 참조하는 function 객체를 찾는다 (heap 을 한 번 훑는다)
+        unresolved = set(unresolved)
+        for referrer in gc.get_referrers(*unresolved):
+            code = getattr(referrer, '__code__', None)
+            if callable(referrer) and code in unresolved:
+                funcs_by_code.setdefault(code, referrer)
+    profile = SampleProfile(stacks, interval, funcs_by_code)
+    if collapsed_file:
+        text_write(profile.collapsed() + '\n', collapsed_file)
+    if not silence:
+        eprint(profile.to_msg())
+    return profile
+
+
+def _find_func_by_qualname(code, f_globals):
+    """module globals 에서 co_qualname (예: 'SegmentTree.get_range_value') 을 따라가 함수 객체를 찾는다"""
+    obj = f_globals
+    for name in getattr(code, 'co_qualname', code.co_name).split('.'):
+        namespace = obj if isinstance(obj, dict) else getattr(obj, '__dict__', {})
+        obj = namespace.get(name)
+        obj = getattr(obj, '__func__', obj)     # staticmethod, classmethod
+        if obj is None:
+            return None
+    return obj if getattr(obj, '__code__', None) is code else None
+
+
+def _code_label(code):
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+def timeit(func, func_args, num_iter=100, time_limit=0.1, silence=False, return_msg=False, **benchmark_kwargs):
+    """benchmark 의 thin wrapper, benchmark_kwargs 는 benchmark 로 그대로 넘긴다"""
+    result = benchmark(func, func_args, num_iter=num_iter, time_limit=time_limit, **benchmark_kwargs)
+    msg = result.to_msg()
     if not silence:
         eprint(msg)
     if return_msg:
         return msg
 
 
-def timeits(func, func_args_list, num_iter=100, time_limit_per_args=0.1, silence=False, return_msg=False):
-    elapse_times = []
-    for func_args in func_args_list:
-        e_times = _calc_elapse_times(func, func_args, num_iter=num_iter, time_limit=time_limit_per_args)
-        elapse_times.extend(e_times)
-    msg = make_elapse_time_msg(elapse_times)
+def timeits(func, func_args_list, num_iter=100, time_limit_per_args=0.1, silence=False, return_msg=False,
+            **benchmark_kwargs):
+    results = [benchmark(func, func_args, num_iter=num_iter, time_limit=time_limit_per_args, **benchmark_kwargs)
+               for func_args in func_args_list]
+    msg = BenchmarkResult.merge(results).to_msg()
     if not silence:
         eprint(msg)
     if return_msg:
         return msg
 
 
-def time_complexity(func: Callable, args_func: Callable, scales: Iterable, num_iter=10, time_limit=1):
-    elapse_times = []
-    for scale in scales:
-        args = args_func(scale)
-        cur_elapse_times = _calc_elapse_times(func, args, num_iter=num_iter, time_limit=time_limit)
-        avg_time = sum(cur_elapse_times) / len(cur_elapse_times)
-        elapse_times.append(avg_time)
-    return {'scale': scales, 'elapse_time': elapse_times}
+@dataclass
+class BenchmarkResult:
+    """benchmark 결과, 시간은 초 단위이고 통계는 outlier 를 제외한 wall time 기준이다"""
+    wall_times: List[float]
+    cpu_times: List[float]
+    outliers: List[float] = field(default_factory=list)
+    peak_memory: Optional[int] = None
+    retained_memory: Optional[int] = None
+    top_allocations: list = field(default_factory=list)     # [(site, size_diff, count_diff), ...] of retained
+
+    @property
+    def num_iter(self):
+        return len(self.wall_times) + len(self.outliers)
+
+    @property
+    def mean(self):
+        return statistics.mean(self.wall_times)
+
+    @property
+    def min(self):
+        return min(self.wall_times)
+
+    @property
+    def median(self):
+        return statistics.median(self.wall_times)
+
+    @property
+    def p95(self):
+        return _percentile(self.wall_times, 95)
+
+    @property
+    def stdev(self):
+        return statistics.stdev(self.wall_times) if len(self.wall_times) >= 2 else 0.
+
+    @property
+    def cpu_mean(self):
+        return statistics.mean(self.cpu_times)
+
+    def to_msg(self):
+        msg = '==> avg_time: {} in {} iterations (min: {}, median: {}, p95: {}, stdev: {}, cpu: {}'.format(
+            _to_time_str(self.mean), self.num_iter, _to_time_str(self.min), _to_time_str(self.median),
+            _to_time_str(self.p95), _to_time_str(self.stdev), _to_time_str(self.cpu_mean))
+        if self.outliers:
+            msg += f', outliers: {len(self.outliers)}'
+        if self.peak_memory is not None:
+            msg += f', peak_memory: {_to_byte_str(self.peak_memory)}'
+        if self.retained_memory is not None:
+            msg += f', retained_memory: {_to_byte_str(self.retained_memory)}'
+        msg += ')'
+        for site, size_diff, count_diff in self.top_allocations:
+            msg += f'\n    {_to_byte_str(size_diff)} in {count_diff} blocks at {site}'
+        return msg
 
+    @classmethod
+    def merge(cls, results: List['BenchmarkResult']) -> 'BenchmarkResult':
+        peak_memories = [result.peak_memory for result in results if result.peak_memory is not None]
+        retained_memories = [result.retained_memory for result in results if result.retained_memory is not None]
+        return cls(
+            wall_times=[t for result in results for t in result.wall_times],
+            cpu_times=[t for result in results for t in result.cpu_times],
+            outliers=[t for result in results for t in result.outliers],
+            peak_memory=max(peak_memories) if peak_memories else None,
+            retained_memory=max(retained_memories) if retained_memories else None,
+            top_allocations=max((result.top_allocations for result in results),
+                                key=lambda allocations: sum(size for _, size, _ in allocations), default=[]),
+        )
+
+
+def benchmark(func, func_args, num_iter=100, time_limit=0.1, warmup=1, disable_gc=False, trace_memory=False,
+              reject_outliers=True, num_top_allocations=3) -> BenchmarkResult:
+    """func(*func_args) 의 wall(perf_counter_ns), cpu(process_time) 시간을 잰다
+
+    :param time_limit: 측정한 wall time 의 합이 이를 넘으면 num_iter 전이라도 멈춘다
+    :param warmup: 측정 전에 결과를 버리고 실행하는 횟수
+    :param disable_gc: 측정하는 동안 gc 를 끈다
+    :param trace_memory: 측정이 끝난 뒤 tracemalloc 으로 한 번 더 실행해서 peak, retained memory 와
+        retained 가 큰 allocation 위치 num_top_allocations 개를 잰다
+    :param reject_outliers: wall time 이 Q3 + 1.5 * IQR 을 넘는 샘플을 통계에서 제외한다
+    """
+    func_args = _norm_func_args(func_args)
+    for _ in range(warmup):
+        func(*func_args)
 
-def compare_func_result(func1, func2, args, silence=False):
+    wall_times, cpu_times = [], []
+    total_time = 0
+    gc_enabled = gc.isenabled()
+    if disable_gc:
+        gc.disable()
     try:
-        res1 = func1(*args)
-    except Exception as ex:
-        res1 = '<<<<<<<<<<< Error1({}) >>>>>>>>>>>>>>>'.format(ex)
+        for _ in range(num_iter):
+            st_wall, st_cpu = time.perf_counter_ns(), time.process_time_ns()
+            func(*func_args)
+            wall_time = (time.perf_counter_ns() - st_wall) / 1e9
+            cpu_times.append((time.process_time_ns() - st_cpu) / 1e9)
+            wall_times.append(wall_time)
+            total_time += wall_time
+            if time_limit and total_time > time_limit:
+                break
+    finally:
+        if disable_gc and gc_enabled:
+            gc.enable()
+
+    outliers = []
+    if reject_outliers and len(wall_times) >= 4:
+        q1, q3 = _percentile(wall_times, 25), _percentile(wall_times, 75)
+        upper = q3 + 1.5 * (q3 - q1)
+        outliers = [t for t in wall_times if t > upper]
+        wall_times = [t for t in wall_times if t <= upper]
+
+    result = BenchmarkResult(wall_times, cpu_times, outliers)
+    if trace_memory:
+        result.peak_memory, result.retained_memory, result.top_allocations = trace_memory_usage(
+            func, func_args, num_top_allocations=num_top_allocations)
+    return result
+
+
+def trace_memory_usage(func, func_args, num_top_allocations=3):
+    """func(*func_args) 한 번의 (peak bytes, retained bytes, top retained allocation sites)
+
+    retained 는 반환값을 버리고 gc 한 뒤에도 남아 있는 (cache, 전역 등에 잡힌) 메모리다.
+    """
+    func_args = _norm_func_args(func_args)
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
     try:
-        res2 = func2(*args)
-    except Exception as ex:
-        res2 = '<<<<<<<<<<< Error2({}) >>>>>>>>>>>>>>>'.format(ex)
+        gc.collect()
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        func(*func_args)
+        _, peak = tracemalloc.get_traced_memory()
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+    # snapshot, gc 등 측정 자체가 남긴 allocation 은 뺀다
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    stats = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), 'lineno')
+    top_allocations = [(str(stat.traceback), stat.size_diff, stat.count_diff)
+                       for stat in stats[:num_top_allocations] if stat.size_diff > 0]
+    return peak - base, current - base, top_allocations
+
+
+def _percentile(xs, q):
+    """nearest-rank percentile"""
+    xs = sorted(xs)
+    return xs[max(math.ceil(len(xs) * q / 100) - 1, 0)]
+
+
+COMPLEXITY_MODELS = {
+    '1': lambda n: 1.,
+    'log n': lambda n: math.log2(n + 1),
+    'n': lambda n: float(n),
+    'n log n': lambda n: n * math.log2(n + 1),
+    'n^2': lambda n: float(n) ** 2,
+    'n^3': lambda n: float(n) ** 3,
+    '2^n': lambda n: 2. ** n,
+}
+
+
+def time_complexity(func: Callable, args_func: Callable, scales: Iterable, num_iter=10, time_limit=1,
+                    total_time_limit=None, min_confidence=0.5, max_refine=0, trace_memory=False):
+    """scale 별 실행 시간을 재고, 어떤 복잡도 모델에 가장 잘 맞는지 fitting 한다
+
+    'scale', 'elapse_time' 은 주어진 scales 순서 그대로 짝지어진다 (예산을 넘으면 거기까지만).
+    :param time_limit: scale 하나당 측정 시간 제한
+    :param total_time_limit: 전체 측정 시간 예산, 넘으면 남은 scale 은 건너뛴다
+    :param min_confidence: fitting confidence 가 이보다 낮으면 측정한 scale 사이에 점을 더 넣는다 (max_refine 개까지)
+    :param trace_memory: scale 별 peak memory 도 재고, 같은 방식으로 fitting 한 결과를 'memory' 에 넣는다
+    :return: {'scale', 'elapse_time', 'model', 'constant', 'confidence', 'fits'}, fits 는 {model: (constant, error)}
+        max_refine 으로 더 잰 점은 'refined_scale', 'refined_elapse_time' 에 따로 넣고, fitting 에는 모두 쓴다
+        trace_memory 이면 'peak_memory', 'retained_memory', 'memory' (fit_complexity 결과) 가 추가된다
+    """
+    st = time.perf_counter()
+
+    def is_over_budget():
+        return total_time_limit is not None and time.perf_counter() - st > total_time_limit
+
+    def measure(scale):
+        args = args_func(scale)
+        memory = trace_memory_usage(func, args)[:2] if trace_memory else (None, None)
+        return benchmark(func, args, num_iter=num_iter, time_limit=time_limit, warmup=0).median, memory
 
+    measured = []
+    for scale in scales:
+        if measured and is_over_budget():
+            break
+        measured.append((scale, ) + measure(scale))
+    refined = []
+
+    def fit_all():
+        points = measured + refined
+        return fit_complexity([p[0] for p in points], [p[1] for p in points])
+
+    fit = fit_all()
+    for _ in range(max_refine):
+        if fit['confidence'] >= min_confidence or is_over_budget():
+            break
+        new_scale = _largest_gap_midpoint(sorted({p[0] for p in measured + refined}))
+        if new_scale is None:
+            break
+        refined.append((new_scale, ) + measure(new_scale))
+        fit = fit_all()
+
+    res = dict({'scale': [p[0] for p in measured], 'elapse_time': [p[1] for p in measured]}, **fit)
+    if refined:
+        res['refined_scale'] = [p[0] for p in refined]
+        res['refined_elapse_time'] = [p[1] for p in refined]
+    if trace_memory:
+        res['peak_memory'] = [p[2][0] for p in measured]
+        res['retained_memory'] = [p[2][1] for p in measured]
+        points = measured + refined
+        res['memory'] = fit_complexity([p[0] for p in points], [p[2][0] for p in points])
+    return res
+
+
+def fit_complexity(scales, values, models=None):
+    """values ~= constant * model(scale) 을 상대오차 최소제곱으로 맞춘다
+
+    confidence 는 1 - (최선 모델 오차 / 차선 모델 오차), 두 모델이 비슷하게 맞으면 0 에 가깝다.
+    """
+    models = models or COMPLEXITY_MODELS
+    fits = {}
+    for name, model in models.items():
+        try:
+            gs = [model(scale) for scale in scales]
+        except OverflowError:
+            continue
+        pairs = [(g, v) for g, v in zip(gs, values) if v > 0]
+        if not pairs or any(math.isinf(g) for g, _ in pairs):
+            continue
+        # minimize sum(((v - c * g) / v) ** 2)
+        constant = sum(g / v for g, v in pairs) / sum((g / v) ** 2 for g, v in pairs)
+        error = math.sqrt(sum(((v - constant * g) / v) ** 2 for g, v in pairs) / len(pairs))
+        fits[name] = (constant, error)
+
+    if not fits:
+        return {'model': None, 'constant': None, 'confidence': 0., 'fits': fits}
+    ranked = sorted(fits, key=lambda name: fits[name][1])
+    best_error = fits[ranked[0]][1]
+    second_error = fits[ranked[1]][1] if len(ranked) > 1 else math.inf
+    confidence = 1 - best_error / second_error if second_error > 0 else 0.
+    return {'model': ranked[0], 'constant': fits[ranked[0]][0], 'confidence': confidence, 'fits': fits}
+
+
+def _largest_gap_midpoint(scales):
+    """비율이 가장 큰 이웃 scale 사이의 기하평균 (정수), 넣을 곳이 없으면 None"""
+    candidates = [(b / a, round(math.sqrt(a * b))) for a, b in zip(scales, scales[1:]) if a > 0 and b - a > 1]
+    if not candidates:
+        return None
+    return max(candidates)[1]
+
+
+def compare_func_result(func1, func2, args, silence=False):
+    res1, _ = _run_case_func(func1, args, 'Error1')
+    res2, _ = _run_case_func(func2, args, 'Error2')
     if res1 != res2:
         if not silence:
-            lines = [
-                '=================== in_str   ==================',
-                repr(args),
-                '=================== func1 ==================',
-                res1,
-                '=================== func2   ==================',
-                res2,
-                '===============================================',
-            ]
-            eprint(merge_to_lines(lines))
+            _print_mismatch(args, res1, res2)
         raise Exception("Match Failed")
 
 
-def compare_func_results(func1, func2, args_iter, silence=False):
-    for args in args_iter:
-        compare_func_result(func1, func2, args, silence=silence)
+@dataclass
+class DiffTestReport:
+    """compare_func_results 결과, mismatches 는 [(args, res1, res2), ...]"""
+    num_cases: int = 0
+    mismatches: list = field(default_factory=list)
+    shrunk_mismatches: list = field(default_factory=list)
+    elapse_time1: float = 0.
+    elapse_time2: float = 0.
 
+    @property
+    def throughput1(self):
+        """func1 cases/sec"""
+        return self.num_cases / self.elapse_time1 if self.elapse_time1 else math.inf
 
-def ext_binary_to_func(binary_path, binary_dir=BINARY_DIR_BASE) -> Callable:
-    def func(in_str):
-        res = subprocess.check_output(binary_path, input=in_str.encode())
-        return res.decode().strip()
+    @property
+    def throughput2(self):
+        return self.num_cases / self.elapse_time2 if self.elapse_time2 else math.inf
+
+    def to_msg(self):
+        return '==> {} cases, {} mismatches (func1: {:.1f} cases/sec, func2: {:.1f} cases/sec)'.format(
+            self.num_cases, len(self.mismatches), self.throughput1, self.throughput2)
+
+
+def compare_func_results(func1, func2, args_iter, silence=False, workers=None, timeout=None, collect_all=False,
+                         shrink=None) -> DiffTestReport:
+    """args_iter 의 각 args 에 대해 func1, func2 결과를 비교한다
 
+    :param workers: 주어지면 process pool 에서 case 들을 나눠 실행한다 (fork 환경에서는 func 을 pickle 하지 않는다)
+    :param timeout: case 하나, func 하나당 제한 시간(초), 넘으면 그 결과는 Timeout 이 된다
+        SIGALRM 을 쓰므로 main thread 에서 부르거나, workers 를 주고 shrink 없이 써야 한다
+    :param collect_all: 첫 mismatch 에서 멈추고 raise 하지 않고, 모든 mismatch 를 모아서 report 로 돌려준다
+    :param shrink: shrink(args) -> 더 작은 args 후보들, mismatch 가 유지되는 후보로 더 이상 줄지 않을 때까지 줄인다
+    """
+    parallel = workers and workers > 1
+    if timeout and (not parallel or shrink) and threading.current_thread() is not threading.main_thread():
+        raise RuntimeError('timeout uses SIGALRM which only works in the main thread, '
+                           'call compare_func_results from the main thread or use workers without shrink')
+
+    report = DiffTestReport()
+    if parallel:
+        with multiprocessing.Pool(workers, initializer=_init_diff_test_worker,
+                                  initargs=(func1, func2, timeout)) as pool:
+            for args, res1, res2, t1, t2 in pool.imap(_diff_test_worker, args_iter, chunksize=8):
+                _add_case(report, args, res1, res2, t1, t2)
+                if report.mismatches and not collect_all:
+                    break
+    else:
+        for args in args_iter:
+            _add_case(report, *_run_case(func1, func2, args, timeout))
+            if report.mismatches and not collect_all:
+                break
+
+    if shrink:
+        report.shrunk_mismatches = [_shrink_case(func1, func2, args, shrink, timeout)
+                                    for args, _, _ in report.mismatches]
+    if not silence:
+        eprint(report.to_msg())
+    if report.mismatches and not collect_all:
+        args, res1, res2 = (report.shrunk_mismatches or report.mismatches)[0]
+        if not silence:
+            _print_mismatch(args, res1, res2)
+        raise Exception("Match Failed")
+    return report
+
+
+def _print_mismatch(args, res1, res2):
+    lines = [
+        '=================== in_str   ==================',
+        repr(args),
+        '=================== func1 ==================',
+        res1,
+        '=================== func2   ==================',
+        res2,
+        '===============================================',
+    ]
+    eprint(merge_to_lines(lines))
+
+
+def _add_case(report, args, res1, res2, t1, t2):
+    report.num_cases += 1
+    report.elapse_time1 += t1
+    report.elapse_time2 += t2
+    if res1 != res2:
+        report.mismatches.append((args, res1, res2))
+
+
+def _run_case(func1, func2, args, timeout=None):
+    res1, t1 = _run_case_func(func1, args, 'Error1', timeout)
+    res2, t2 = _run_case_func(func2, args, 'Error2', timeout)
+    return args, res1, res2, t1, t2
+
+
+def _run_case_func(func, args, error_name, timeout=None):
+    """(result, elapse_time), 에러와 timeout 은 비교할 수 있는 문자열 결과로 바꾼다"""
+    st = time.perf_counter()
+    try:
+        with _time_limit(timeout):
+            res = func(*args)
+    except _CaseTimeout:
+        res = '<<<<<<<<<<< Timeout({}s) >>>>>>>>>>>>>>>'.format(timeout)
+    except Exception as ex:
+        res = '<<<<<<<<<<< {}({}) >>>>>>>>>>>>>>>'.format(error_name, ex)
+    return res, time.perf_counter() - st
+
+
+def _shrink_case(func1, func2, args, shrink, timeout=None):
+    """mismatch 가 유지되는 첫 후보로 계속 옮겨가며 더 이상 줄지 않는 args 를 찾는다"""
+    _, res1, res2, _, _ = _run_case(func1, func2, args, timeout)
+    shrunk = True
+    while shrunk:
+        shrunk = False
+        for candidate in shrink(args):
+            _, cand_res1, cand_res2, _, _ = _run_case(func1, func2, candidate, timeout)
+            if cand_res1 != cand_res2:
+                args, res1, res2 = candidate, cand_res1, cand_res2
+                shrunk = True
+                break
+    return args, res1, res2
+
+
+class _CaseTimeout(Exception):
+    pass
+
+
+@contextmanager
+def _time_limit(timeout):
+    if not timeout:
+        yield
+        return
+
+    def handler(signum, frame):
+        raise _CaseTimeout()
+
+    prev_handler = signal.signal(signal.SIGALRM, handler)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, prev_handler)
+
+
+_worker_funcs = None
+
+
+def _init_diff_test_worker(func1, func2, timeout):
+    global _worker_funcs
+    _worker_funcs = (func1, func2, timeout)
+
+
+def _diff_test_worker(args):
+    func1, func2, timeout = _worker_funcs
+    return _run_case(func1, func2, args, timeout)
+
+
+def ext_binary_to_func(binary_path, binary_dir=BINARY_DIR_BASE, timeout=None, workers=1, cache_size=0,
+                       framed=False) -> Callable:
+    """외부 binary 를 in_str -> stripped stdout 함수로 만든다
+
+    :param timeout: 호출 하나당 제한 시간(초), 넘으면 subprocess.TimeoutExpired
+    :param workers: func.map(in_strs) 가 동시에 돌릴 호출 수 (framed 이면 띄워둘 process 수)
+    :param cache_size: 같은 in_str 의 결과를 lru 로 캐시한다 (0 이면 캐시하지 않음)
+    :param framed: binary 를 매번 실행하지 않고 workers 개를 띄워두고 재사용한다.
+        binary 는 '<byte 길이>\\n<payload>' 형식의 입력을 반복해서 읽고, 같은 형식으로 답해야 한다
+    """
     binary_path = os.path.join(binary_dir, binary_path)
+    if framed:
+        processes = queue.Queue()
+        for _ in range(workers):
+            processes.put(_FramedProcess(binary_path))
+
+        def func(in_str):
+            process = processes.get()
+            try:
+                return process.call(in_str, timeout=timeout)
+            finally:
+                processes.put(process)
+
+        def close():
+            while not processes.empty():
+                processes.get().close()
+    else:
+        def func(in_str):
+            res = subprocess.check_output(binary_path, input=in_str.encode(), timeout=timeout)
+            return res.decode().strip()
+
+        def close():
+            pass
+
+    if cache_size:
+        func = lru_cache(cache_size)(func)
+
+    def map_func(in_strs):
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(func, in_strs))
+
+    func.map = map_func
+    func.close = close
     return func
 
 
-def mock_io(func):
-    def mocked_func(stdin_str):
-        with patch("sys.stdin", StringIO(stdin_str)), patch("sys.stdout", new_callable=StringIO) as mocked_out:
-            func()
-        return mocked_out.getvalue().strip()
-    return mocked_func
+class _FramedProcess:
+    """'<byte 길이>\\n<payload>' 로 요청과 응답을 주고받는 오래 사는 binary process"""
+
+    def __init__(self, binary_path):
+        self.binary_path = binary_path
+        self.proc = None
+        self._start()
+
+    def call(self, in_str, timeout=None):
+        payload = in_str.encode()
+        self.timed_out = False
+        timer = threading.Timer(timeout, self._kill_on_timeout) if timeout else None
+        if timer:
+            timer.start()
+        try:
+            self.proc.stdin.write(b'%d\n' % len(payload) + payload)
+            self.proc.stdin.flush()
+            size = int(self.proc.stdout.readline())
+            res = self.proc.stdout.read(size)
+        except (OSError, ValueError):
+            # 죽었거나 protocol 이 깨진 process 는 버리고 새로 띄운다
+            self.proc.kill()
+            self.proc.wait()
+            self._start()
+            if self.timed_out:
+                raise subprocess.TimeoutExpired(self.binary_path, timeout)
+            raise ChildProcessError(f'{self.binary_path} failed while handling a request')
+        finally:
+            if timer:
+                timer.cancel()
+        return res.decode().strip()
+
+    def _kill_on_timeout(self):
+        self.timed_out = True
+        self.proc.kill()
+
+    def close(self):
+        if self.proc.poll() is None:
+            self.proc.stdin.close()
+            self.proc.wait()
+
+    def _start(self):
+        self.proc = subprocess.Popen(self.binary_path, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+
+def mock_io(func, fast=False, output='str'):
+    """stdin 을 입력 문자열로, stdout 을 반환값(strip)으로 바꾼 함수를 만든다
+
+    :param fast: unittest.mock.patch 대신 sys.stdin/sys.stdout 을 직접 바꾸고 stdout buffer 를 재사용한다.
+        stdin 에 sys.stdin.buffer 가 있으므로 sys.stdin.buffer.readline 도 쓸 수 있다. 입력은 str, bytes 모두 된다
+    :param output: fast 일 때 반환 형식 'str' 또는 'bytes'
+    """
+    if not fast:
+        def mocked_func(stdin_str):
+            with patch("sys.stdin", StringIO(stdin_str)), patch("sys.stdout", new_callable=StringIO) as mocked_out:
+                func()
+            return mocked_out.getvalue().strip()
+        return mocked_func
+
+    swapped_io = _SwappedIO()
+
+    def fast_mocked_func(stdin_data):
+        with swapped_io:
+            return swapped_io.run(func, stdin_data, output=output)
+    return fast_mocked_func
+
+
+def mock_io_many(func, inputs, output='str'):
+    """mock_io(func, fast=True) 를 inputs 각각에 적용한다, stdin/stdout 교체는 한 번만 한다"""
+    swapped_io = _SwappedIO()
+    with swapped_io:
+        return [swapped_io.run(func, stdin_data, output=output) for stdin_data in inputs]
+
+
+class _SwappedIO:
+    """with 안에서 sys.stdin/sys.stdout 을 BytesIO 기반 TextIOWrapper 로 바꾼다, stdout buffer 는 호출마다 비워서 재사용한다"""
+
+    def __init__(self):
+        self.out = BytesIO()
+        self.stdout = TextIOWrapper(self.out, encoding='utf8', write_through=True)
+        self._saved = None
+
+    def __enter__(self):
+        self._saved = sys.stdin, sys.stdout
+        sys.stdout = self.stdout
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        sys.stdin, sys.stdout = self._saved
+
+    def run(self, func, stdin_data, output='str'):
+        if isinstance(stdin_data, str):
+            stdin_data = stdin_data.encode('utf8')
+        sys.stdin = TextIOWrapper(BytesIO(stdin_data), encoding='utf8')
+        self.stdout.seek(0)
+        self.stdout.truncate()
+        func()
+        self.stdout.flush()
+        res = self.out.getvalue().strip()
+        if output == 'bytes':
+            return res
+        elif output == 'str':
+            return res.decode('utf8')
+        else:
+            raise ValueError(f'Unknown output: {output}')
 
 
 @deprecated(details='use mock_io')
@@ -180,20 +865,15 @@ def _evaluate(func, func_args, io_mock=False):
 
 
 def _calc_elapse_times(func, func_args, num_iter=1, time_limit=None) -> List[float]:
-    """execute func and return elapse times (and print out to stderr)"""
-    elapse_times = []
+    """execute func and return wall elapse times"""
+    result = benchmark(func, func_args, num_iter=num_iter, time_limit=time_limit, warmup=0, reject_outliers=False)
+    return result.wall_times
+
+
+def _norm_func_args(func_args):
     if isinstance(func_args, str) or not isinstance(func_args, Iterable):
         func_args = (func_args, )
-    total_time = 0
-    for _ in range(num_iter):
-        st = time.process_time()
-        func(*func_args)
-        elapse_time = time.process_time() - st
-        elapse_times.append(elapse_time)
-        total_time += elapse_time
-        if time_limit and total_time > time_limit:
-            break
-    return elapse_times
+    return func_args
 
 
 def _to_time_str(sec):
@@ -209,6 +889,17 @@ def _to_time_str(sec):
         return '{:.2f}ns'.format(sec * 1e9)
 
 
+def _to_byte_str(num_bytes):
+    if abs(num_bytes) >= 1 << 30:
+        return '{:.2f}GB'.format(num_bytes / (1 << 30))
+    elif abs(num_bytes) >= 1 << 20:
+        return '{:.2f}MB'.format(num_bytes / (1 << 20))
+    elif abs(num_bytes) >= 1 << 10:
+        return '{:.2f}KB'.format(num_bytes / (1 << 10))
+    else:
+        return '{}B'.format(num_bytes)
+
+
 def make_elapse_time_msg(elapse_times):
     avg_time = sum(elapse_times) / len(elapse_times)
     msg = '==> avg_time: {} in {} iterations'.format(_to_time_str(avg_time), len(elapse_times))
@@ -0,0 +1,16 @@
+#!/usr/bin/python3
+
+import sys
+import time
+
+stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+while True:
+    line = stdin.readline()
+    if not line:
+        break
+    in_str = stdin.read(int(line)).decode()
+    if in_str == 'sleep':
+        time.sleep(10)
+    out = f'{in_str} processed'.encode()
+    stdout.write(b'%d\n' % len(out) + out)
+    stdout.flush()
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from util.benchmark_history import *
+from util.result_check import BenchmarkResult
+
+
+def make_result(wall_times):
+    return BenchmarkResult(wall_times=wall_times, cpu_times=wall_times)
+
+
+def test_record_and_check_regressions(temp_dir):
+    history_file = os.path.join(temp_dir, 'bench.jsonl')
+    fast = [0.010 + i * 1e-5 for i in range(30)]
+    slow = [0.015 + i * 1e-5 for i in range(30)]
+    record_benchmark(history_file, len, [1, 2], make_result(fast), changed='base', git_rev='a')
+    record_benchmark(history_file, len, [1, 2], make_result(slow), changed='slow', git_rev='b')
+    record_benchmark(history_file, sum, [1, 2], make_result(fast), git_rev='a')
+    record_benchmark(history_file, sum, [1, 2], make_result(fast), git_rev='b')
+
+    records = load_benchmark_history(history_file, func=len)
+    assert [record['changed'] for record in records] == ['base', 'slow']
+    assert records[0]['args_fingerprint'] == args_fingerprint([1, 2])
+
+    comparisons = {comparison.func: comparison for comparison in check_regressions(history_file)}
+    assert comparisons['builtins.len'].is_regression
+    assert comparisons['builtins.len'].ratio > 1.4
+    assert not comparisons['builtins.sum'].is_regression
+    assert main([history_file]) == 1
+    assert main([history_file, '--func', 'builtins.sum']) == 0
+
+
+class Query:
+    def __init__(self, xs):
+        self.xs = xs
+
+
+def test_args_fingerprint():
+    """repr 과 달리 객체 주소나 numpy 의 생략에 영향받지 않아야 한다"""
+    assert args_fingerprint([Query([1, 2])]) == args_fingerprint([Query([1, 2])])
+    assert args_fingerprint([Query([1, 2])]) != args_fingerprint([Query([1, 3])])
+    assert args_fingerprint([{'b', 'a', 'c'}]) == args_fingerprint([{'c', 'a', 'b'}])
+    assert args_fingerprint([lambda: 0]) == args_fingerprint([lambda: 0])      # pickle 할 수 없으면 주소를 뺀 repr
+    assert args_fingerprint([1, 2], args_key='small') == 'small'
+
+    np = pytest.importorskip('numpy')
+    xs = np.zeros(10 ** 4, dtype=np.int64)
+    ys = xs.copy()
+    ys[5000] = 1
+    assert repr(xs) == repr(ys)
+    assert args_fingerprint([xs]) == args_fingerprint([xs.copy()])
+    assert args_fingerprint([xs]) != args_fingerprint([ys])
+
+
+def test_args_fingerprint_set_is_stable_across_hash_seeds():
+    import subprocess
+    import sys
+
+    code = 'from util.benchmark_history import args_fingerprint; print(args_fingerprint([{"a", "b", "c", "d"}]))'
+    cwd = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    outputs = {subprocess.check_output([sys.executable, '-c', code], cwd=cwd,
+                                       env=dict(os.environ, PYTHONHASHSEED=str(seed))) for seed in range(4)}
+    assert len(outputs) == 1
@@ -1,8 +1,13 @@
 from itertools import combinations
+from operator import add
+import os
 import random
 
+import pytest
+
 from ..data_structure import *
 from util import *
+from util.itertools import str_findall
 
 
 def test_FenwickTree():
@@ -18,12 +23,147 @@ def test_FenwickTree():
         assert (tree.get_range_value(i, j-1), (i, j)) == (sum(xs[i:j]), (i, j))
 
 
+def test_FenwickTree_lower_bound():
+    xs = [2, 0, 3, 7, 4, 0, 5]
+    tree = FenwickTree(xs, storage='array')
+    for target in range(sum(xs) + 2):
+        expected = next((i for i in range(len(xs)) if sum(xs[:i+1]) >= target), len(xs))
+        assert (tree.lower_bound(target), target) == (expected, target)
+
+
+def test_FenwickTreeRangeUpdate():
+    xs = [random.randint(-5, 5) for _ in range(13)]
+    tree = FenwickTreeRangeUpdate(xs)
+    for _ in range(50):
+        left, right = gen_range(len(xs))
+        diff = random.randint(-3, 3)
+        for i in range(left, right + 1):
+            xs[i] += diff
+        tree.range_update(left, right, diff)
+
+        left, right = gen_range(len(xs))
+        assert tree.get_range_value(left, right) == sum(xs[left:right+1])
+
+
+def test_FenwickTree2D():
+    R, C = 5, 7
+    matrix = [[random.randint(-5, 5) for _ in range(C)] for _ in range(R)]
+    tree = FenwickTree2D(matrix)
+    for _ in range(50):
+        r, c, diff = random.randrange(R), random.randrange(C), random.randint(-3, 3)
+        matrix[r][c] += diff
+        tree.update(r, c, diff)
+
+        r1, r2 = gen_range(R)
+        c1, c2 = gen_range(C)
+        assert tree.get_range_value(r1, c1, r2, c2) == sum(sum(row[c1:c2+1]) for row in matrix[r1:r2+1])
+
+
+def test_FenwickTreeNumpy():
+    pytest.importorskip('numpy')
+    xs = [random.randint(-10, 10) for _ in range(41)]
+    tree, expected = FenwickTreeNumpy(xs), FenwickTree(xs)
+    idxs = [random.randrange(len(xs)) for _ in range(100)]
+    diffs = [random.randint(-10, 10) for _ in range(100)]
+    tree.update_many(idxs, diffs)
+    for idx, diff in zip(idxs, diffs):
+        expected.update(idx, diff)
+
+    ranges = [gen_range(len(xs)) for _ in range(100)]
+    lefts, rights = zip(*ranges)
+    assert list(tree.get_range_values(lefts, rights)) == [expected.get_range_value(l, r) for l, r in ranges]
+
+
+@pytest.mark.parametrize(['ufunc_name', 'acc_func', 'init'], [
+    ('add', add, 0),
+    ('minimum', min, float('inf')),
+    ('maximum', max, -float('inf')),
+])
+def test_SegmentTreeNumpy(ufunc_name, acc_func, init):
+    np = pytest.importorskip('numpy')
+    xs = [random.randint(-10, 10) for _ in range(29)]
+    tree = SegmentTreeNumpy(xs, ufunc=getattr(np, ufunc_name), init=init)
+    expected = SegmentTree(xs, acc_func=acc_func, init=init)
+    idxs = [random.randrange(len(xs)) for _ in range(100)]
+    diffs = [random.randint(-10, 10) for _ in range(100)]
+    tree.update_many(idxs, diffs)
+    expected.update_many(idxs, diffs)
+
+    ranges = [gen_range(len(xs)) for _ in range(100)]
+    assert list(tree.query_many(ranges)) == expected.query_many(ranges)
+
+
 def test_KMP():
     assert KMP('ababaca').table == [0, 0, 1, 2, 3, 0, 1]
     assert list(KMP('abababc').search('ababababc abababd')) == [2]
     assert list(KMP('abcdabd').search('abc abcdab abcdabcdabde')) == [15]
 
 
+def test_KMP_bytes():
+    text = b'abc abcdab abcdabcdabde abcdabd'
+    assert list(KMP(b'abcdabd').search(text)) == [15, 24]
+    assert list(KMP(b'abcdabd').search(memoryview(text))) == [15, 24]
+    assert list(KMP(b'aa').search(bytearray(b'aaaa'))) == [0, 1, 2]
+
+
+def test_KMP_stream():
+    text = 'abc abcdab abcdabcdabde abcdabd'
+    expected = list(KMP('abcdabd').search(text))
+    for chunk_size in range(1, 10):
+        chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        assert list(KMP('abcdabd').search_stream(chunks)) == expected
+
+    kmp = KMP(b'aa')
+    assert kmp.feed(b'a') == []
+    assert kmp.feed(b'aa') == [0, 1]
+    assert kmp.feed(b'ba') == []
+    assert kmp.feed(b'a') == [4]
+
+
+def test_KMP_search_file(temp_dir):
+    import mmap
+
+    file_path = os.path.join(temp_dir, 'log.txt')
+    with open(file_path, 'wb') as f:
+        f.write(b'xx abcdabd ' * 100)
+    kmp = KMP(b'abcdabd')
+    expected = list(range(3, 1100, 11))
+    assert list(kmp.search_file(file_path, chunk_size=7)) == expected
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        assert list(kmp.search(mm)) == expected
+        assert list(KMPAutomaton(b'abcdabd').search(mm)) == expected
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        matches = kmp.search(mm)
+        assert next(matches) == 3     # 중간에 멈춰도 mmap 을 닫을 수 있어야 한다
+
+
+def test_KMPAutomaton():
+    for _ in range(100):
+        ptn = bytes(random.choices(b'ab', k=random.randint(1, 4)))
+        text = bytes(random.choices(b'abc', k=50))
+        expected = list(KMP(ptn).search(text))
+        assert (list(KMPAutomaton(ptn).search(text)), ptn, text) == (expected, ptn, text)
+        chunks = [text[i:i + 7] for i in range(0, len(text), 7)]
+        assert list(KMPAutomaton(ptn).search_stream(chunks)) == expected
+
+
+def test_KMPAutomaton_benchmark():
+    text = bytes(random.choices(b'ACGT', k=10 ** 5))
+    ptn = b'ACGTAC'
+    expected = list(str_findall(ptn, text))
+    kmp, kmp_automaton = KMP(ptn), KMPAutomaton(ptn)
+    assert list(kmp.search(text)) == expected
+    assert list(kmp_automaton.search(text)) == expected
+
+    for name, func in [
+        ('KMP', lambda: list(kmp.search(text))),
+        ('KMPAutomaton', lambda: list(kmp_automaton.search(text))),
+        ('str_findall', lambda: list(str_findall(ptn, text))),
+    ]:
+        msg = timeit(func, [], num_iter=5, time_limit=0.5, silence=True, return_msg=True)
+        eprint(name, msg)
+
+
 def test_SegmentTree_add():
     xs = [2, 3, 7, 4, 5, 9, 6, 1]
     tree = SegmentTree(xs)
@@ -64,6 +204,38 @@ def test_SegmentTree_max():
         assert (tree.get_range_value(i, j-1), (i, j)) == (max(xs[i:j]), (i, j))
 
 
+def test_SegmentTree_storage():
+    xs = [2, 3, 7, 4, 5, 9, 6, 1, 8]
+    for storage in [None, 'array']:
+        tree = SegmentTree(xs, storage=storage)
+        for i, j in combinations(range(len(xs)), 2):
+            assert (tree.get_range_value(i, j-1), (i, j)) == (sum(xs[i:j]), (i, j))
+
+
+def test_SegmentTree_non_commutative():
+    xs = list('abcdefg')
+    tree = SegmentTree(xs, init='')
+    for i, j in combinations(range(len(xs) + 1), 2):
+        assert tree.get_range_value(i, j-1) == ''.join(xs[i:j])
+
+
+def test_SegmentTree_batch():
+    xs = [random.randint(-10, 10) for _ in range(37)]
+    tree = SegmentTree(xs, acc_func=min, init=float('inf'))
+    idxs = [random.randrange(len(xs)) for _ in range(10)]
+    diffs = [random.randint(-10, 10) for _ in range(10)]
+    for idx, diff in zip(idxs, diffs):
+        xs[idx] += diff
+    tree.update_many(idxs, diffs)
+
+    ranges = [gen_range(len(xs)) for _ in range(50)]
+    assert tree.query_many(ranges) == [min(xs[left:right+1]) for left, right in ranges]
+
+    tree = SegmentTree([1, 2, 3, 4])
+    tree.update_many((i for i in [0, 1]), iter([10, 10]))     # iterator 도 된다
+    assert tree.get_range_value(0, 3) == 30
+
+
 def gen_range(n):
     left, right = random.randint(0, n - 1), random.randint(0, n - 1)
     if left > right:
@@ -105,6 +277,54 @@ def test_SegmentTreeLazy_base():
         assert (tree.get_range_value(i, j-1), (i, j)) == (sum(xs[i:j]), (i, j))
 
 
+def test_SegmentTreeLazyGeneric_assign_min():
+    """range assign / range min, None means no assignment"""
+    xs = [random.randint(0, 100) for _ in range(23)]
+    tree = SegmentTreeLazyGeneric(
+        xs, op=min, e=float('inf'),
+        mapping=lambda f, x: x if f is None else f,
+        composition=lambda f, g: g if f is None else f,
+        id_map=None,
+    )
+    for _ in range(100):
+        left, right = gen_range(len(xs))
+        value = random.randint(0, 100)
+        xs[left:right+1] = [value] * (right - left + 1)
+        tree.range_update(left, right, value)
+
+        left, right = gen_range(len(xs))
+        assert tree.get_range_value(left, right) == min(xs[left:right+1])
+    assert [tree.get_value(i) for i in range(len(xs))] == xs
+
+
+def test_SegmentTreeLazyGeneric_affine_sum():
+    """x -> b * x + c on (sum, length) nodes"""
+    xs = [random.randint(-5, 5) for _ in range(19)]
+    tree = SegmentTreeLazyGeneric(
+        [(x, 1) for x in xs],
+        op=lambda x, y: (x[0] + y[0], x[1] + y[1]),
+        e=(0, 0),
+        mapping=lambda f, x: (f[0] * x[0] + f[1] * x[1], x[1]),
+        composition=lambda f, g: (f[0] * g[0], f[0] * g[1] + f[1]),
+        id_map=(1, 0),
+    )
+    for _ in range(100):
+        left, right = gen_range(len(xs))
+        b, c = random.randint(-2, 2), random.randint(-3, 3)
+        for i in range(left, right + 1):
+            xs[i] = b * xs[i] + c
+        tree.range_update(left, right, (b, c))
+
+        idx = random.randrange(len(xs))
+        xs[idx] = random.randint(-5, 5)
+        tree.set_value(idx, (xs[idx], 1))
+
+        left, right = gen_range(len(xs))
+        lazy = list(tree.lazy)
+        assert tree.get_range_value(left, right)[0] == sum(xs[left:right+1])
+        assert tree.lazy == lazy    # read only
+
+
 def test_Tree_iter_preorder():
     values = range(7)
     edges = [(0, 1), (1, 2), (3, 2), (3, 4), (5, 1), (5, 6)]
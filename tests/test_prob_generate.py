@@ -1,3 +1,10 @@
+import io
+import os
+import random
+from collections import Counter
+
+import pytest
+
 from util.prob_generate import *
 
 
@@ -15,3 +22,119 @@ def test_merge_to_lines():
         'a',
         'b\nc'
     ]) == '1 2\n3\na\nb\nc'
+
+
+@pytest.mark.parametrize('args', [
+    [[1, 2], 3, 'a', 'b\nc'],
+    [list(range(10)), [], 'x'],
+    [],
+    [[(1, 2), (3, 4)]],
+])
+def test_write_lines(args, temp_dir):
+    text_file, bytes_file = io.StringIO(), io.BytesIO()
+    write_lines(args, text_file, chunk_size=3)
+    write_lines(args, bytes_file, chunk_size=3)
+    assert text_file.getvalue() == merge_to_lines(args)
+    assert bytes_file.getvalue() == merge_to_lines(args).encode()
+
+    file_path = os.path.join(temp_dir, 'in.txt')
+    write_lines(args, file_path)
+    with open(file_path) as f:
+        assert f.read() == merge_to_lines(args)
+
+
+def test_write_lines_numpy():
+    np = pytest.importorskip('numpy')
+    matrix = np.arange(12).reshape(4, 3)
+    out = io.BytesIO()
+    write_lines([4, np.arange(5), matrix], out, chunk_size=3)
+    assert out.getvalue().decode() == merge_to_lines([4, list(range(5))] + matrix.tolist())
+    assert list_to_string(np.arange(3)) == '0 1 2'
+
+
+def test_write_lines_numpy_memory(temp_dir):
+    """1차원 array 전체를 python int list 로 바꾸지 않아야 한다 (2 * 10^5 개면 약 8MB)"""
+    import tracemalloc
+
+    np = pytest.importorskip('numpy')
+    xs = np.arange(2 * 10 ** 5)
+    tracemalloc.start()
+    try:
+        write_lines([xs], os.path.join(temp_dir, 'big.txt'), chunk_size=1000)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak < 2 * 10 ** 6
+
+
+def make_prob(n, rng):
+    xs = [rng.randint(0, 100) for _ in range(rng.randint(1, n))]
+    return merge_to_lines([len(xs), xs])
+
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_generate_probs_seeded(workers):
+    probs = list(generate_probs(make_prob, [10], count=8, random_state=7, pass_rng=True, workers=workers))
+    assert probs == list(generate_probs(make_prob, [10], count=8, random_state=7, pass_rng=True))
+    assert len(set(probs)) > 1
+    assert generate_prob(make_prob, [10], 7, 5) == probs[5]
+
+
+def test_generate_probs_case_seed():
+    """str, bytes seed 도 되고, (random_state, case_index) 가 다르면 seed 도 다르다"""
+    for random_state in ['abc', b'abc']:
+        probs = list(generate_probs(make_prob, [10], count=3, random_state=random_state, pass_rng=True))
+        assert generate_prob(make_prob, [10], random_state, 2) == probs[2]
+    assert case_seed(1, 0) != case_seed(0, 1)
+    assert case_seed(1, 0) != case_seed('1', 0)
+
+
+def test_sample_partial():
+    rng = random.Random(1)
+    xs = list(range(10))
+    for k in range(11):
+        res = sample_partial(xs, k, rng)
+        assert len(res) == len(set(res)) == k and set(res) <= set(xs)
+    assert xs == list(range(10))
+    with pytest.raises(ValueError):
+        sample_partial(xs, 11, rng)
+
+    res = sample_range(10 ** 18, 2 * 10 ** 18, 5, rng)
+    assert len(set(res)) == 5 and all(10 ** 18 <= x < 2 * 10 ** 18 for x in res)
+    assert len(set(random_choices(xs, 3, rng=rng))) == 3
+    assert sorted(random_choices(xs, rng=rng)) == xs
+
+
+def test_random_choices():
+    """sequence 가 아닌 것도 되고, rng 가 없으면 전역 random 을 예전 방식 그대로 쓴다"""
+    for xs in [{1, 2, 3, 4, 5}, {i: i for i in range(1, 6)}.keys(), (i for i in range(1, 6))]:
+        res = random_choices(xs, 2, rng=random.Random(0))
+        assert len(set(res)) == 2 and set(res) <= {1, 2, 3, 4, 5}
+    assert len(random_choices((i for i in range(5)), 2)) == 2
+
+    random.seed(5)
+    res = random_choices(range(10), 3)
+    random.seed(5)
+    xs = list(range(10))
+    random.shuffle(xs)
+    assert res == xs[:3]
+
+
+def test_reservoir_sample():
+    rng = random.Random(2)
+    assert reservoir_sample(iter(range(3)), 5, rng) == [0, 1, 2]
+    counts = Counter()
+    for _ in range(2000):
+        res = reservoir_sample((i for i in range(20)), 4, rng)
+        assert len(set(res)) == 4
+        counts.update(res)
+    assert min(counts.values()) > 300     # each expected 400
+
+
+def test_AliasTable():
+    rng = random.Random(3)
+    table = AliasTable([1, 0, 3, 6])
+    counts = Counter(table.samples(10000, rng))
+    assert counts[1] == 0
+    assert 800 < counts[0] < 1200 and 2600 < counts[2] < 3400 and 5500 < counts[3] < 6500
+    assert table.sample(rng) in {0, 2, 3}
@@ -1,5 +1,8 @@
 import sys
 import os
+import subprocess
+import math
+import time
 
 import pytest
 
@@ -16,6 +19,35 @@ def main_incorrect():
     return stdin.readline() + ' what?'
 
 
+_leaked = []
+
+
+def leaky_alloc(n):
+    _leaked.append(list(range(n)))
+    return [0] * n
+
+
+def test_trace_memory_usage():
+    peak, retained, top_allocations = trace_memory_usage(leaky_alloc, 10000)
+    assert peak >= 2 * 8 * 10000
+    assert 8 * 10000 <= retained < peak
+    assert 'test_result_check.py' in top_allocations[0][0]
+
+    msg = timeit(leaky_alloc, 1000, num_iter=2, silence=True, return_msg=True, trace_memory=True)
+    assert 'retained_memory' in msg and 'test_result_check.py' in msg
+    _leaked.clear()
+
+    _, _, top_allocations = trace_memory_usage(lambda: None, [])
+    assert not any('result_check.py' in site and 'test_result_check.py' not in site for site, _, _ in top_allocations)
+
+
+def test_time_complexity_memory():
+    res = time_complexity(lambda n: [0] * n, lambda n: n, [1000, 10000, 100000], num_iter=1, max_refine=0,
+                          trace_memory=True)
+    assert res['memory']['model'] == 'n'
+    assert res['peak_memory'][-1] > res['peak_memory'][0]
+
+
 def test_compare_func_result():
     def func1(s):
         return s + '1'
@@ -28,8 +60,191 @@ def test_compare_func_result():
         compare_func_result(func1, func2, 'a')
 
 
+def main_echo_sum():
+    input = sys.stdin.buffer.readline
+    n = int(input())
+    xs = list(map(int, input().split()))
+    print(n, sum(xs))
+    sys.stdout.buffer.write('합\n'.encode())
+
+
+def test_mock_io_fast():
+    assert mock_io(main_echo_sum, fast=True)('2\n3 4\n') == '2 7\n합'
+    assert mock_io(main_echo_sum, fast=True, output='bytes')(b'1\n5\n') == '1 5\n합'.encode()
+    assert mock_io_many(main_echo_sum, ['1\n1', b'2\n1 2']) == ['1 1\n합', '2 3\n합']
+    assert mock_io(lambda: print(main_correct()), fast=True)('hi\n') == 'hi processed'
+
+    stdin, stdout = sys.stdin, sys.stdout
+    with pytest.raises(ValueError):
+        mock_io(lambda: int('x'), fast=True)('')
+    assert (sys.stdin, sys.stdout) == (stdin, stdout)
+
+
+def buggy_sorted(xs):
+    return sorted(xs) if len(xs) < 3 or xs[0] != 7 else xs
+
+
+def slow_when_negative(xs):
+    if xs and xs[0] < 0:
+        time.sleep(1)
+    return sorted(xs)
+
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_compare_func_results_collect_all(workers):
+    args_iter = [([3, 1, 2],), ([7, 5, 1, 9],), ([7, 1],), ([2, 7, 1],), ([7, 2, 2, 0, 4],)]
+
+    def shrink(args):
+        xs = args[0]
+        return [(xs[:i] + xs[i + 1:],) for i in range(len(xs))]
+
+    report = compare_func_results(sorted, buggy_sorted, args_iter, silence=True, workers=workers,
+                                  collect_all=True, shrink=shrink)
+    assert report.num_cases == 5
+    assert [args for args, _, _ in report.mismatches] == [([7, 5, 1, 9],), ([7, 2, 2, 0, 4],)]
+    assert [args for args, _, _ in report.shrunk_mismatches] == [([7, 1, 9],), ([7, 0, 4],)]
+    assert report.throughput1 > 0
+
+    with pytest.raises(Exception):
+        compare_func_results(sorted, buggy_sorted, args_iter, silence=True, workers=workers)
+
+
+def test_compare_func_results_timeout():
+    report = compare_func_results(sorted, slow_when_negative, [([1, 0],), ([-1, 0],)], silence=True,
+                                  timeout=0.05, collect_all=True)
+    assert len(report.mismatches) == 1
+    assert 'Timeout' in report.mismatches[0][2]
+
+
+def test_compare_func_results_timeout_off_main_thread():
+    """SIGALRM 을 쓸 수 없는 thread 에서는 모든 case 를 mismatch 로 만들지 말고 바로 알려준다"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    args_iter = [([1, 0],), ([2, 1],)]
+    with ThreadPoolExecutor(1) as executor:
+        future = executor.submit(compare_func_results, sorted, sorted, args_iter, silence=True, timeout=1)
+        with pytest.raises(RuntimeError, match='main thread'):
+            future.result()
+        future = executor.submit(compare_func_results, sorted, sorted, args_iter, silence=True)
+        assert not future.result().mismatches
+
+
+def busy_inner(n):
+    return sum(i * i for i in range(n))
+
+
+def busy_outer(n):
+    acc = 0
+    for _ in range(20):
+        acc += busy_inner(n)
+    return acc
+
+
+@pytest.mark.parametrize('mode', ['thread', 'signal'])
+def test_sample_profile(mode, temp_dir):
+    collapsed_file = os.path.join(temp_dir, 'out.collapsed')
+    profile = sample_profile(busy_outer, 100000, interval=0.001, mode=mode, silence=True,
+                             collapsed_file=collapsed_file)
+    assert profile.num_samples > 0
+    assert all(stack[0] is busy_outer.__code__ for stack in profile.stacks)
+    assert busy_inner in profile.suggest_lprun_funcs()
+    with open(collapsed_file) as f:
+        line = f.readline()
+    assert line.startswith('busy_outer (test_result_check.py:')
+    assert 'suggested lprun funcs' in profile.to_msg()
+
+
+class Busy:
+    def inner(self, n):
+        return busy_inner(n) + self.helper(n)
+
+    @staticmethod
+    def helper(n):
+        return sum(i * i for i in range(n))
+
+
+def test_sample_profile_methods_and_nested_funcs():
+    """module 의 top-level 함수가 아닌 method, nested function 도 추천해야 한다"""
+    busy = Busy()
+
+    def nested(n):
+        return busy.inner(n)
+
+    def run(n):
+        return [nested(n) for _ in range(10)]
+
+    profile = sample_profile(run, 100000, interval=0.001, silence=True)
+    suggested = profile.suggest_lprun_funcs(n=10)
+    assert Busy.inner in suggested or Busy.helper in suggested
+    assert profile.funcs_by_code[nested.__code__] is nested
+
+
 def test_ext_binary_to_func():
     binary_dir = os.path.abspath(os.path.dirname(__file__))
     binary_path = 'ext_sample.py'
     func = ext_binary_to_func(binary_path, binary_dir)
     assert func('hi') == 'hi processed'
+
+    func = ext_binary_to_func(binary_path, binary_dir, workers=4, cache_size=16)
+    assert func.map(['a', 'b', 'c']) == ['a processed', 'b processed', 'c processed']
+    assert func('a') == 'a processed'
+    assert func.cache_info().hits == 1
+
+
+def test_ext_binary_to_func_framed():
+    binary_dir = os.path.abspath(os.path.dirname(__file__))
+    func = ext_binary_to_func('ext_framed_sample.py', binary_dir, workers=2, timeout=1, framed=True)
+    try:
+        in_strs = [f'x{i}\ny' for i in range(20)]
+        assert func.map(in_strs) == [f'{in_str} processed' for in_str in in_strs]
+        with pytest.raises(subprocess.TimeoutExpired):
+            func('sleep')
+        assert func('hi') == 'hi processed'
+    finally:
+        func.close()
+
+
+def test_benchmark():
+    calls = []
+
+    def func(n):
+        calls.append(n)
+        return [0] * n
+
+    result = benchmark(func, 10000, num_iter=20, time_limit=None, warmup=2, disable_gc=True, trace_memory=True)
+    assert len(calls) == 2 + 20 + 1
+    assert result.num_iter == 20 and len(result.cpu_times) == 20
+    assert result.min <= result.median <= result.p95 <= max(result.wall_times)
+    assert result.peak_memory >= 8 * 10000
+    assert 'peak_memory' in result.to_msg()
+
+    msg = timeits(func, [10, 100], num_iter=3, time_limit_per_args=None, silence=True, return_msg=True, warmup=0)
+    assert msg.startswith('==> avg_time') and 'in 6 iterations' in msg
+
+
+@pytest.mark.parametrize(['model', 'time_func'], [
+    ('n', lambda n: 3e-6 * n),
+    ('n^2', lambda n: 2e-9 * n * n),
+    ('n log n', lambda n: 1e-7 * n * math.log2(n + 1)),
+])
+def test_fit_complexity(model, time_func):
+    scales = [2 ** i for i in range(4, 16)]
+    fit = fit_complexity(scales, [time_func(n) for n in scales])
+    assert fit['model'] == model
+    assert fit['confidence'] > 0.5
+
+
+def test_time_complexity():
+    res = time_complexity(sorted, lambda n: [list(range(n, 0, -1))], [100000, 10, 1000], num_iter=3)
+    assert res['scale'] == [100000, 10, 1000]    # 주어진 순서 그대로 elapse_time 과 짝지어진다
+    assert len(res['elapse_time']) == 3 and res['elapse_time'][0] > res['elapse_time'][1]
+    assert res['model'] in COMPLEXITY_MODELS
+    assert 'refined_scale' not in res
+
+    res = time_complexity(sorted, lambda n: [list(range(n, 0, -1))], [10, 1000, 100000], num_iter=3,
+                          total_time_limit=5, min_confidence=1.1, max_refine=2)
+    assert res['scale'] == [10, 1000, 100000]
+    assert len(res['refined_scale']) == len(res['refined_elapse_time']) == 2
+
+    res = time_complexity(sorted, lambda n: [list(range(n))], [10, 100, 1000], total_time_limit=0)
+    assert res['scale'] == [10]
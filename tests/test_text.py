@@ -1,6 +1,13 @@
+import os
+import re
+
 import pytest
 
 from ..text import Match, AhocorasickWrapper, search_highlight, strip_margin, multi_replace, remove_4byte_unicode
+from ..text import load_automaton, clear_automaton_cache, iter_search_highlight, MultiReplacer
+from ..text import get_multi_replacer
+from ..text import iter_normalize_text, normalize_files
+from ..tools import norm_whitespace
 
 
 def test_ahocorasick_wrapper_with_allow_substring_match():
@@ -28,12 +35,94 @@ def test_ahocorasick_wrapper_no_substring_match():
     ]
 
 
+def test_ahocorasick_wrapper_no_substring_match_random():
+    """정렬해서 거르는 방식과 결과가 같아야 한다"""
+    import random
+
+    keywords = list({''.join(random.choices('ab', k=random.randint(1, 4))) for _ in range(10)})
+    text = ''.join(random.choices('abc', k=200))
+    matches = AhocorasickWrapper(keywords, allow_substring_match=True).find_all(text)
+    expected = []
+    max_end = 0
+    for match in sorted(matches, key=lambda m: (m.start, -m.end)):
+        if match.end > max_end:
+            expected.append(match)
+            max_end = match.end
+    assert AhocorasickWrapper(keywords).find_all(text) == expected
+
+
 def test_ahocorasick_wrapper_with_empty_keywords():
     """빈 keywords가 들어와도 정상동작 해야 한다"""
     kwtree = AhocorasickWrapper([])
     assert kwtree.find_all('abc') == []
 
 
+@pytest.mark.parametrize('allow_substring_match', [True, False])
+def test_ahocorasick_wrapper_add_remove_keywords(allow_substring_match):
+    """add/remove 한 결과는 처음부터 만든 것과 같아야 하고, compact 후에도 같아야 한다"""
+    text = 'xabcdey abcd bcde'
+    kwtree = AhocorasickWrapper(['abcd', 'bc', 'xyz'], allow_substring_match=allow_substring_match)
+    kwtree.add_keywords(['bcd', 'abc', 'cde'])
+    kwtree.remove_keywords(['xyz', 'bc', 'cde'])
+    kwtree.add_keywords(['cde'])
+    expected = AhocorasickWrapper(['abcd', 'bcd', 'abc', 'cde'], allow_substring_match=allow_substring_match)
+    assert kwtree.find_all(text) == expected.find_all(text)
+
+    kwtree.compact(background=True).join()
+    assert kwtree._state[1:] == (None, frozenset())
+    assert kwtree.find_all(text) == expected.find_all(text)
+
+    kwtree.remove_keywords(['abcd', 'bcd', 'abc', 'cde'])
+    assert kwtree.find_all(text) == []
+
+
+def test_ahocorasick_wrapper_compact_publishes_state_at_once(monkeypatch):
+    """compact 가 delta automaton 을 만드는 동안에도 find_all 은 이전 state 전체를 봐야 한다 (중복 매칭 없음)"""
+    text = 'xabcdey'
+    kwtree = AhocorasickWrapper(['abcd'], allow_substring_match=True)
+    kwtree.add_keywords(['cde'])
+    expected = kwtree.find_all(text)
+
+    make_kwtree = AhocorasickWrapper._make_kwtree
+    seen = []
+
+    def make_kwtree_and_find(keywords):
+        seen.append(kwtree.find_all(text))
+        return make_kwtree(keywords)
+
+    monkeypatch.setattr(AhocorasickWrapper, '_make_kwtree', staticmethod(make_kwtree_and_find))
+    kwtree.compact()
+    assert seen and all(result == expected for result in seen)
+    assert kwtree.find_all(text) == expected
+
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_ahocorasick_wrapper_find_all_many(workers):
+    keywords = ['abcd', 'bc', 'bcd', 'abc', 'cde']
+    texts = ['xabcdey', 'bcd bc', '', 'cdecde'] * 10
+    kwtree = AhocorasickWrapper(keywords)
+    expected = [kwtree.find_all(text) for text in texts]
+    assert list(kwtree.find_all_many(texts, workers=workers, chunksize=3)) == expected
+
+    compact_results = list(kwtree.find_all_many(texts, workers=workers, compact=True))
+    assert [[Match(keywords[kw_id], start, end) for kw_id, start, end in zip(*result)]
+            for result in compact_results] == expected
+
+
+def test_load_automaton(temp_dir):
+    """같은 keywords 는 순서와 상관없이 메모리와 파일 캐시를 공유한다"""
+    keywords = ['abcd', 'bc', 'bcd', 'abc', 'cde']
+    clear_automaton_cache()
+    kwtree = load_automaton(keywords, cache_dir=temp_dir)
+    assert load_automaton(list(reversed(keywords))) is kwtree
+    assert len(os.listdir(temp_dir)) == 1
+
+    clear_automaton_cache()
+    wrapper = AhocorasickWrapper(keywords, cache_dir=temp_dir)
+    assert wrapper.kwtree is not kwtree
+    assert wrapper.find_all('xabcdey') == [Match('abcd', 1, 5), Match('cde', 3, 6)]
+
+
 @pytest.mark.parametrize(['text', 'ptn_list', 'expected'], [
     ('ab cde fg', ['cde'], 'ab *cde* fg'),
     ('ab cde fg | ab cd fg', ['cd', 'cde'], 'ab *cde* fg | ab *cd* fg'),    # substring 관계 패턴, 긴 패턴 우선
@@ -51,6 +140,53 @@ def test_search_highlight_html(text, ptn_list, expected):
     assert search_highlight(text, ptn_list, mode='html') == expected
 
 
+@pytest.mark.parametrize(['text', 'ptn_list', 'expected'], [
+    ('ab cde fg', ['cde'], 'ab *cde* fg'),
+    ('ab cde fg | ab cd fg', ['cd', 'cde'], 'ab *cde* fg | ab *cd* fg'),
+    ('__|0|__ cd', ['cd'], '__|0|__ *cd*'),      # placeholder 와 같은 문자열이 있어도 된다
+    ('abcde', ['abc', 'cde'], '*abc*de'),         # 겹치면 먼저 시작하는 것 우선
+    ('xabcd', ['ab', 'bcd', 'c'], 'x*ab**c*d'),
+    ('abc', [], 'abc'),
+])
+def test_search_highlight_automaton(text, ptn_list, expected):
+    assert search_highlight(text, ptn_list, mode='md', engine='automaton') == expected
+
+
+def test_iter_search_highlight():
+    assert list(iter_search_highlight('ab cde fg', ['cde', 'fg'], target_format='[{}]')) == [
+        'ab ', '[cde]', ' ', '[fg]',
+    ]
+
+
+def test_iter_leftmost_longest():
+    """regex alternation (긴 것 먼저) 과 같은 결과를, 전체 매칭을 모으지 않고 scan 하면서 내보낸다"""
+    import random
+
+    from ..text import _iter_leftmost_longest
+
+    for _ in range(200):
+        keywords = list({''.join(random.choices('ab', k=random.randint(1, 4))) for _ in range(4)})
+        text = ''.join(random.choices('abc', k=40))
+        regex = re.compile('|'.join(map(re.escape, sorted(keywords, key=len, reverse=True))))
+        expected = [(match.start(), match.end(), match.group(0)) for match in regex.finditer(text)]
+        kwtree = load_automaton(keywords)
+        assert list(_iter_leftmost_longest(kwtree, text, max(map(len, keywords)))) == expected
+
+    class LazyKwtree:
+        """'ab' 가 2 글자마다 매칭되는 긴 text, 첫 span 을 받을 때까지 scan 이 얼마나 진행됐는지 센다"""
+        num_scanned = 0
+
+        def iter(self, text):
+            for end_index in range(1, len(text), 2):
+                self.num_scanned += 1
+                yield end_index, 'ab'
+
+    kwtree = LazyKwtree()
+    spans = _iter_leftmost_longest(kwtree, 'ab' * 10 ** 5, 2)
+    assert next(spans) == (0, 2, 'ab')
+    assert kwtree.num_scanned <= 2
+
+
 def test_strip_margin():
     s = '''
     ab c
@@ -66,6 +202,50 @@ def test_multi_replace():
     assert multi_replace(string, substitutions) == 'spam FOO BAR FOO BAR spam'
 
 
+def test_get_multi_replacer_cache():
+    """같은 내용의 mapping 객체는 hash 없이 재사용하고, 제자리에서 고치면 새로 만든다"""
+    substitutions = {"foo": "FOO", "bar": "BAR"}
+    replacer = get_multi_replacer(substitutions)
+    assert get_multi_replacer(substitutions) is replacer
+    assert get_multi_replacer(dict(substitutions)) is not replacer
+    assert get_multi_replacer(substitutions, backend='regex') is not replacer
+
+    substitutions['spam'] = 'SPAM'
+    assert multi_replace('spam foo', substitutions) == 'SPAM FOO'
+
+    d = {'a': 'X', 'b': 'Y'}
+    assert multi_replace('ab', d) == 'XY'
+    d['a'] = 'Z'
+    assert multi_replace('ab', d) == 'ZY'
+    del d['b']
+    d['c'] = 'W'
+    assert multi_replace('abc', d) == 'ZbW'
+
+
+@pytest.mark.parametrize('backend', ['regex', 'trie', 'automaton'])
+def test_MultiReplacer(backend, temp_dir):
+    import random
+
+    substitutions = {''.join(random.choices('abc', k=random.randint(1, 4))): str(i) for i in range(20)}
+    string = ''.join(random.choices('abcd', k=300))
+    regex = re.compile('|'.join(map(re.escape, sorted(substitutions, key=len, reverse=True))))
+    expected = regex.sub(lambda match: substitutions[match.group(0)], string)
+
+    replacer = MultiReplacer(substitutions, backend=backend)
+    assert replacer.replace(string) == expected
+    assert replacer.replace_many([string, '', 'd']) == [expected, '', 'd']
+    for chunk_size in [1, 3, 7, 100]:
+        chunks = [string[i:i + chunk_size] for i in range(0, len(string), chunk_size)]
+        assert ''.join(replacer.iter_replace_chunks(chunks)) == expected
+
+    src_path, dst_path = os.path.join(temp_dir, 'src.txt'), os.path.join(temp_dir, 'out/dst.txt')
+    with open(src_path, 'w') as f:
+        f.write(string)
+    replacer.replace_file(src_path, dst_path, chunk_size=5)
+    with open(dst_path) as f:
+        assert f.read() == expected
+
+
 @pytest.mark.parametrize(['in_text', 'expected'], [
     ('가나다💕라마바사', '가나다라마바사'),
     ('abcdefghi', 'abcdefghi'),
@@ -73,3 +253,24 @@ def test_multi_replace():
 def test_remove_4byte_unicode(in_text, expected):
     assert remove_4byte_unicode(in_text) == expected
 
+
+
+def test_iter_normalize_text(temp_dir):
+    text = ' 가나다💕라 \n\t마 foo  bar\ud83d\ude00 foo\n'
+    substitutions = {'foo bar': 'X', '라 마': 'Y'}
+    expected = multi_replace(norm_whitespace(remove_4byte_unicode(text).replace('\ud83d\ude00', '')), substitutions)
+    assert expected == '가나다Y X foo'
+    for chunk_size in range(1, 6):
+        chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        assert ''.join(iter_normalize_text(chunks, substitutions)) == expected
+
+    path_pairs = []
+    for i in range(3):
+        src_path = os.path.join(temp_dir, f'src{i}.txt')
+        with open(src_path, 'w', encoding='utf8') as f:
+            f.write(text.replace('\ud83d\ude00', ''))
+        path_pairs.append((src_path, os.path.join(temp_dir, f'dst{i}.txt')))
+    normalize_files(path_pairs, workers=2, substitutions=substitutions, chunk_size=3)
+    for _, dst_path in path_pairs:
+        with open(dst_path, encoding='utf8') as f:
+            assert f.read() == expected
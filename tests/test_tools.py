@@ -80,6 +80,13 @@ def test_norm_whitespace(text, expected):
     assert tools.norm_whitespace(text) == expected
 
 
+@pytest.mark.parametrize('text', ['a  b', ' a  b ', 'a\nb\t', '하늘  사 \t랑', '  ', '', 'ab cd  ef\n'])
+def test_iter_norm_whitespace(text):
+    for chunk_size in range(1, 5):
+        chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        assert ''.join(tools.iter_norm_whitespace(chunks)) == tools.norm_whitespace(text)
+
+
 @pytest.mark.parametrize(['texts_list', 'expected'], [
     ([['a', 'b'], ['c', 'd']], 'a\tb\nc\td'),
     ([['a x ', '\t b \n'], ['c', ' d ']], 'a x\tb\nc\td'),
@@ -88,6 +95,22 @@ def test_flat_text_with_sep(texts_list, expected):
     assert tools.flat_text_with_sep(texts_list) == expected
 
 
+@pytest.mark.parametrize('text', ['a b', 'a  b', ' a', 'a ', 'a\tb', 'a\u3000b', '', ' ', '하늘 사랑'])
+def test_fast_norm_whitespace(text):
+    assert tools.fast_norm_whitespace(text) == tools.norm_whitespace(text)
+
+
+@pytest.mark.parametrize(['texts_list', 'expected'], [
+    ([['a', 'b'], ['c', 'd']], 'a\tb\nc\td'),
+    ([['a x ', '\t b \n'], ['c', ' d ']], 'a x\tb\nc\td'),
+    ([], ''),
+])
+def test_write_flat_text_with_sep(texts_list, expected, temp_dir):
+    file_path = pjoin(temp_dir, 'out', 'flat.tsv')
+    assert tools.write_flat_text_with_sep(iter(texts_list), file_path) == len(texts_list)
+    assert Path(file_path).read_text() == expected == tools.flat_text_with_sep(texts_list)
+
+
 @pytest.mark.parametrize(['url', 'expected'], [
     ('http://a.b.com/x/do?p=1&q=2', '/x/do?p=1&q=2'),
     ('//a.b.com/x/do?p=1&q=2', '/x/do?p=1&q=2'),
@@ -1,33 +1,166 @@
-from typing import List
+from typing import List, Iterable, Iterator, Tuple
+from array import array
+from collections import OrderedDict
 from dataclasses import dataclass
+from functools import partial
 from inspect import cleandoc
+import codecs
+import hashlib
+import heapq
+import multiprocessing
+import os
+import pickle
 import re
+import threading
 
 from ahocorasick import Automaton
 
+from util.tools import make_parent_dir, pickle_load, iter_norm_whitespace
+
+AUTOMATON_CACHE_SIZE = 8
+_automaton_cache = OrderedDict()
+MULTI_REPLACER_CACHE_SIZE = 32
+_multi_replacer_cache = OrderedDict()   # (id(substitutions), backend) -> (substitutions, MultiReplacer)
+
 
 @dataclass
 class Match:
+    __slots__ = ('keyword', 'start', 'end')
     keyword: str
     start: int
     end: int
 
 
 class AhocorasickWrapper:
-    def __init__(self, keywords: List[str], allow_substring_match=False):
-        self.kwtree = self._make_kwtree(keywords)
+    def __init__(self, keywords: List[str], allow_substring_match=False, use_cache=False, cache_dir=None,
+                 compact_threshold=1000):
+        """
+        :param use_cache: share the automaton through the in-memory LRU (see load_automaton)
+        :param cache_dir: additionally save/load the built automaton under cache_dir (implies use_cache)
+        :param compact_threshold: add/remove 된 keyword 수가 이를 넘으면 background 에서 compact 한다 (None 이면 하지 않음)
+        """
+        if use_cache or cache_dir:
+            kwtree = load_automaton(keywords, cache_dir=cache_dir)
+        else:
+            kwtree = self._make_kwtree(keywords)
         self.allow_substring_match = allow_substring_match
+        self.compact_threshold = compact_threshold
+        self.keywords = set(keywords)
+        self.keyword_ids = {}   # keyword -> id for the compact result, removed keywords keep their id
+        self._assign_keyword_ids(keywords)
+        self._lock = threading.Lock()
+        self._compact_thread = None
+        self._base_keywords = frozenset(self.keywords)
+        # (base automaton, delta automaton of added keywords, removed keywords), find_all 은 한 번에 읽은 snapshot 만 쓴다
+        self._state = (kwtree, None, frozenset())
+
+    @property
+    def kwtree(self):
+        return self._state[0]
 
     def find_all(self, text: str) -> List[Match]:
-        if self.kwtree:
-            ahocorasick_result = self.kwtree.iter(text)
-            matches = self._alt_result_to_match(ahocorasick_result)
-            if self.allow_substring_match:
-                return matches
-            else:
-                return self._exclude_substring_match(matches)
+        return [Match(kw, start, end) for start, end, kw in self._iter_spans(text)]
+
+    def find_all_compact(self, text: str) -> Tuple[array, array, array]:
+        """find_all 과 같은 매칭을 Match 대신 (keyword_ids, starts, ends) 평행 int array 로 돌려준다"""
+        spans = self._iter_spans(text)
+        keyword_ids = self.keyword_ids
+        return (array('l', [keyword_ids[kw] for _, _, kw in spans]),
+                array('l', [start for start, _, _ in spans]),
+                array('l', [end for _, end, _ in spans]))
+
+    def find_all_many(self, texts: Iterable[str], workers=None, compact=False, chunksize=64):
+        """texts 각각에 대해 find_all (compact 이면 find_all_compact) 결과를 texts 순서대로 yield 한다
+
+        workers 가 주어지면 process pool 에서 나눠 처리하고, 끝난 문서부터 순서대로 흘려보낸다.
+        fork 환경에서는 worker 들이 부모의 automaton 을 복사 없이 공유한다.
+        """
+        find = self.find_all_compact if compact else self.find_all
+        if not workers or workers <= 1:
+            for text in texts:
+                yield find(text)
+            return
+
+        with multiprocessing.Pool(workers, initializer=_init_find_all_worker, initargs=(self, compact)) as pool:
+            yield from pool.imap(_find_all_worker, texts, chunksize=chunksize)
+
+    def _iter_result(self, text):
+        """base, delta automaton 의 결과를 합친 pyahocorasick 형식 [(end_index, kw), ...]"""
+        kwtree, delta_kwtree, removed = self._state
+        ahocorasick_result = kwtree.iter(text) if kwtree else []
+        if removed:
+            ahocorasick_result = (item for item in ahocorasick_result if item[1] not in removed)
+        if delta_kwtree:
+            # 두 결과 모두 (end_index, 긴 keyword 먼저) 순서이므로 그 순서를 유지하며 합친다
+            ahocorasick_result = heapq.merge(ahocorasick_result, delta_kwtree.iter(text),
+                                             key=lambda item: (item[0], -len(item[1])))
+        return ahocorasick_result
+
+    def __getstate__(self):
+        """lock, thread 는 pickle 할 수 없으므로 빼고 보낸다 (spawn 방식의 process pool 용)"""
+        state = self.__dict__.copy()
+        del state['_lock'], state['_compact_thread']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._compact_thread = None
+
+    def add_keywords(self, keywords):
+        with self._lock:
+            self.keywords.update(keywords)
+            self._assign_keyword_ids(keywords)
+            self._refresh_state()
+        self._compact_if_needed()
+
+    def remove_keywords(self, keywords):
+        with self._lock:
+            self.keywords.difference_update(keywords)
+            self._refresh_state()
+        self._compact_if_needed()
+
+    def compact(self, background=False):
+        """현재 keywords 전체로 base automaton 을 다시 만든다
+
+        background 이면 thread 에서 만들고, 만드는 동안 find_all 은 이전 automaton 으로 계속 응답한다.
+        """
+        if background:
+            if self._compact_thread and self._compact_thread.is_alive():
+                return self._compact_thread
+            self._compact_thread = threading.Thread(target=self._compact, daemon=True)
+            self._compact_thread.start()
+            return self._compact_thread
         else:
-            return []
+            self._compact()
+
+    def _compact(self):
+        with self._lock:
+            keywords = frozenset(self.keywords)
+        kwtree = self._make_kwtree(keywords)
+        with self._lock:
+            self._base_keywords = keywords
+            self._state = self._make_state(kwtree)
+
+    def _compact_if_needed(self):
+        kwtree, delta_kwtree, removed = self._state
+        num_changed = len(removed) + (len(delta_kwtree) if delta_kwtree else 0)
+        if self.compact_threshold is not None and num_changed > self.compact_threshold:
+            self.compact(background=True)
+
+    def _assign_keyword_ids(self, keywords):
+        for keyword in keywords:
+            self.keyword_ids.setdefault(keyword, len(self.keyword_ids))
+
+    def _refresh_state(self):
+        """base automaton 은 그대로 두고, 추가된 keyword 로 작은 delta automaton 을 만든다 (lock 안에서 호출)"""
+        self._state = self._make_state(self._state[0])
+
+    def _make_state(self, kwtree):
+        """kwtree 를 base 로 하는 새 state, delta 까지 다 만든 뒤 한 번에 대입해야 find_all 이 섞인 state 를 보지 않는다"""
+        added = self.keywords - self._base_keywords
+        removed = frozenset(self._base_keywords - self.keywords)
+        return kwtree, self._make_kwtree(sorted(added)), removed
 
     @staticmethod
     def _make_kwtree(keywords):
@@ -40,33 +173,102 @@ class AhocorasickWrapper:
             kwtree = None
         return kwtree
 
+    def _iter_spans(self, text):
+        """[(start, end, kw), ...], pyahocorasick 의 end 값은 매칭된 마지막 index 이므로 python slicing 개념으로 바꾼다"""
+        spans = ((end_index + 1 - len(kw), end_index + 1, kw) for end_index, kw in self._iter_result(text))
+        if self.allow_substring_match:
+            return list(spans)
+        else:
+            return self._exclude_substring_spans(spans)
+
     @staticmethod
-    def _alt_result_to_match(ahocorasick_results) -> List[Match]:
-        """pyahocorasick 에서 나오는 end 값은 매칭된 마지막 index, python slicing 개념의 start, end로 바꾼다
-        [(kw, end_index), ...] -> [(kw, start, end), ...]
+    def _exclude_substring_spans(spans):
+        """다른 매칭에 substring으로 포함되는 매칭은 무시한다, 정렬 없이 한 번에 처리한다
+
+        spans 는 (end, 긴 것 먼저) 순서로 들어오고, 남긴 것들은 start, end 모두 증가하는 stack 으로 유지한다.
+        1. 같은 end 의 더 긴 매칭이 이미 남아 있으면 지금 것은 그 substring 이다.
+        2. 아니면 지금 것이 stack 위쪽의 start 가 같거나 큰 매칭들을 모두 포함하므로 그것들을 버린다.
         """
-        return [Match(kw, end_index + 1 - len(kw), end_index + 1) for end_index, kw in ahocorasick_results]
+        kept = []
+        for span in spans:
+            start, end, _ = span
+            if kept and kept[-1][1] == end:
+                continue
+            while kept and kept[-1][0] >= start:
+                kept.pop()
+            kept.append(span)
+        return kept
 
-    @staticmethod
-    def _exclude_substring_match(matches: List[Match]):
-        """다름 매칭에 substring으로 포함되는 매칭은 무시한다"""
-        matches = sorted(matches, key=lambda m: (m.start, -m.end))
-        non_substring_matches = []
-        max_end = 0
-        for match in matches:
-            if match.end > max_end:
-                non_substring_matches.append(match)
-                max_end = match.end
-        return non_substring_matches
-
-
-def search_highlight(text, ptn_list, mode='md') -> str:
-    if mode in ['md', 'markdown']:
-        target_format = '*{}*'
-    elif mode in ['html', 'htm']:
-        target_format = '<b>{}</b>'
+
+_worker_wrapper = None
+_worker_compact = False
+
+
+def _init_find_all_worker(wrapper, compact):
+    global _worker_wrapper, _worker_compact
+    _worker_wrapper, _worker_compact = wrapper, compact
+
+
+def _find_all_worker(text):
+    if _worker_compact:
+        return _worker_wrapper.find_all_compact(text)
+    return _worker_wrapper.find_all(text)
+
+
+def automaton_cache_key(keywords) -> str:
+    """keyword 순서와 중복에 상관없이 같은 키를 만든다"""
+    digest = hashlib.sha1()
+    for keyword in sorted(set(keywords)):
+        digest.update(keyword.encode('utf8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def load_automaton(keywords, cache_dir=None):
+    """keywords 로 만든 Automaton 을 in-memory LRU, cache_dir 의 pickle 순으로 찾고, 없으면 만들어서 저장한다
+
+    automaton 은 읽기 전용으로 공유된다. fork 전에 부모 프로세스에서 load 해두면 worker 들은 copy-on-write 로 같은 것을 쓴다.
+    """
+    key = automaton_cache_key(keywords)
+    if key in _automaton_cache:
+        _automaton_cache.move_to_end(key)
+        return _automaton_cache[key]
+
+    file_path = os.path.join(cache_dir, f'{key}.automaton.pkl') if cache_dir else None
+    if file_path and os.path.exists(file_path):
+        kwtree = pickle_load(file_path)
     else:
-        raise ValueError(f'Unknown mode: {mode}')
+        kwtree = AhocorasickWrapper._make_kwtree(keywords)
+        if file_path:
+            # 여러 worker 가 동시에 저장할 수 있으므로 임시 파일에 쓰고 rename 한다
+            make_parent_dir(file_path)
+            tmp_path = f'{file_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(kwtree, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, file_path)
+
+    _automaton_cache[key] = kwtree
+    while len(_automaton_cache) > AUTOMATON_CACHE_SIZE:
+        _automaton_cache.popitem(last=False)
+    return kwtree
+
+
+def clear_automaton_cache():
+    _automaton_cache.clear()
+
+
+def search_highlight(text, ptn_list, mode='md', target_format=None, engine='replace') -> str:
+    """text 안의 ptn_list 를 강조한다
+
+    :param target_format: '*{}*' 처럼 직접 지정하는 형식, 주어지면 mode 는 무시한다
+    :param engine: 'replace' 는 패턴마다 str.replace 를 한다.
+        'automaton' 은 캐시된 Aho-Corasick automaton 으로 한 번만 훑는다 (iter_search_highlight)
+    """
+    target_format = _get_highlight_format(mode, target_format)
+    if engine == 'automaton':
+        return ''.join(iter_search_highlight(text, ptn_list, target_format=target_format))
+    elif engine != 'replace':
+        raise ValueError(f'Unknown engine: {engine}')
 
     # 긴 패턴의 replace를 우선한다.
     ptn_list = sorted(ptn_list, key=lambda x: len(x), reverse=True)
@@ -86,6 +288,71 @@ def search_highlight(text, ptn_list, mode='md') -> str:
     return text
 
 
+def iter_search_highlight(text, ptn_list, mode='md', target_format=None):
+    """search_highlight 의 한 번 훑기 버전, 강조된 결과를 조각으로 yield 한다
+
+    같은 위치에서는 긴 패턴을, 겹치는 매칭은 먼저 시작하는 것을 우선한다.
+    text 에 placeholder 를 넣지 않으므로 text 의 내용과 상관없이 동작한다.
+    """
+    target_format = _get_highlight_format(mode, target_format)
+    ptn_list = [ptn for ptn in ptn_list if ptn]
+    prev_end = 0
+    if ptn_list:
+        max_len = max(map(len, ptn_list))
+        for start, end, ptn in _iter_leftmost_longest(load_automaton(ptn_list), text, max_len):
+            if start > prev_end:
+                yield text[prev_end:start]
+            yield target_format.format(ptn)
+            prev_end = end
+    if prev_end < len(text):
+        yield text[prev_end:]
+
+
+def _iter_leftmost_longest(kwtree, text, max_len):
+    """겹치지 않는 (start, end, kw) 를 가장 왼쪽, 그 중 가장 긴 것 우선으로 고른다 (regex alternation 과 같은 규칙)
+
+    pyahocorasick 은 end 순서로 매칭을 주므로, 이후 매칭의 start 는 모두 (지금 end + 1 - max_len) 이상이다.
+    그보다 왼쪽의 후보는 더 왼쪽이나 더 긴 매칭이 올 수 없으므로 바로 고르고 yield 한다.
+    들고 있는 후보는 max_len (가장 긴 keyword 길이) 크기의 window 안의 것뿐이다.
+    """
+    pending = {}    # start -> 가장 긴 kw
+    starts = []     # pending 의 start heap
+    prev_end = 0
+
+    def pop_until(limit):
+        nonlocal prev_end
+        while starts and starts[0] < limit:
+            start = heapq.heappop(starts)
+            kw = pending.pop(start)
+            if start >= prev_end:
+                prev_end = start + len(kw)
+                yield start, prev_end, kw
+
+    for end_index, kw in kwtree.iter(text):
+        start = end_index + 1 - len(kw)
+        if start >= prev_end:
+            if start not in pending:
+                heapq.heappush(starts, start)
+                pending[start] = kw
+            elif len(pending[start]) < len(kw):
+                pending[start] = kw
+        limit = end_index + 1 - max_len
+        if starts and starts[0] < limit:
+            yield from pop_until(limit)
+    yield from pop_until(len(text) + 1)
+
+
+def _get_highlight_format(mode, target_format=None):
+    if target_format:
+        return target_format
+    elif mode in ['md', 'markdown']:
+        return '*{}*'
+    elif mode in ['html', 'htm']:
+        return '<b>{}</b>'
+    else:
+        raise ValueError(f'Unknown mode: {mode}')
+
+
 def strip_margin(text):
     """Use inspect.cleandoc instead"""
     return cleandoc(text)
@@ -94,10 +361,141 @@ def strip_margin(text):
 def multi_replace(string, substitutions):
     """dict으로 들어온 매핑을 사용해 string을 replace한다
     ref : https://gist.github.com/carlsmith/b2e6ba538ca6f58689b4c18f46fef11c?fbclid=IwAR3Aw1StDSDbQIHY9aZHca0A37e-b9v1RCsE9jofRmBKFrT9w-ZsWRWjsBI
+
+    같은 substitutions 객체로 반복 호출하면 캐시된 MultiReplacer 를 쓴다 (get_multi_replacer 참고). 가장 빠른 것은 MultiReplacer 를 직접 들고 쓰는 것이다.
+    """
+    return get_multi_replacer(substitutions).replace(string)
+
+
+class MultiReplacer:
+    """substitutions 를 한 번 컴파일해두고 재사용하는 multi_replace, 가장 왼쪽, 그 중 가장 긴 key 를 우선한다
+
+    backend
+      - 'regex': 긴 key 순서의 alternation (기존 multi_replace 방식)
+      - 'trie': key 들의 trie 로 만든 regex, 수천 개의 alternative 를 하나씩 시도하지 않는다
+      - 'automaton': Aho-Corasick automaton
+    """
+
+    def __init__(self, substitutions, backend='trie'):
+        self.substitutions = dict(substitutions)
+        self.backend = backend
+        self.max_key_len = max(map(len, self.substitutions), default=0)
+        keys = [key for key in self.substitutions if key]
+        self.regex = None
+        self.kwtree = None
+        if not keys:
+            pass
+        elif backend == 'regex':
+            self.regex = re.compile('|'.join(map(re.escape, sorted(keys, key=len, reverse=True))))
+        elif backend == 'trie':
+            self.regex = re.compile(self.make_trie_regex(keys))
+        elif backend == 'automaton':
+            self.kwtree = AhocorasickWrapper._make_kwtree(keys)
+        else:
+            raise ValueError(f'Unknown backend: {backend}')
+
+    @staticmethod
+    def make_trie_regex(keys) -> str:
+        """['abc', 'abd', 'ab'] -> 'ab(?:c|d)?', 자식 뒤의 greedy '?' 덕분에 긴 key 가 우선한다"""
+        trie = {}
+        for key in keys:
+            node = trie
+            for c in key:
+                node = node.setdefault(c, {})
+            node[''] = True
+
+        def to_regex(node):
+            is_terminal = '' in node
+            alts = [re.escape(c) + to_regex(child) for c, child in sorted(node.items()) if c]
+            if not alts:
+                return ''
+            if len(alts) > 1:
+                ptn = '(?:' + '|'.join(alts) + ')'
+                return ptn + '?' if is_terminal else ptn
+            else:
+                return f'(?:{alts[0]})?' if is_terminal else alts[0]
+
+        return to_regex(trie)
+
+    def replace(self, string):
+        if self.regex:
+            substitutions = self.substitutions
+            return self.regex.sub(lambda match: substitutions[match.group(0)], string)
+        elif self.kwtree:
+            return ''.join(self._iter_replaced_automaton(string))
+        else:
+            return string
+
+    def replace_many(self, strings):
+        replace = self.replace
+        return [replace(string) for string in strings]
+
+    def iter_replace_chunks(self, chunks):
+        """chunk 들을 이어진 하나의 문자열처럼 replace 해서 조각으로 yield 한다
+
+        buffer 의 마지막 max_key_len - 1 글자 안에서 시작하는 매칭은 다음 chunk 에 따라 달라질 수 있으므로 넘겨서 처리한다.
+        """
+        buffer = ''
+        for chunk in chunks:
+            buffer += chunk
+            boundary = len(buffer) - self.max_key_len + 1
+            if boundary <= 0:
+                continue
+            pos = 0
+            for start, end, key in self._iter_matches(buffer):
+                if start >= boundary:
+                    break
+                yield buffer[pos:start] + self.substitutions[key]
+                pos = end
+            if pos < boundary:
+                yield buffer[pos:boundary]
+                pos = boundary
+            buffer = buffer[pos:]
+        if buffer:
+            yield self.replace(buffer)
+
+    def replace_file(self, src_path, dst_path, chunk_size=1 << 20, encoding='utf8'):
+        """파일 전체를 메모리에 올리지 않고 chunk 단위로 replace 해서 dst_path 에 쓴다"""
+        make_parent_dir(dst_path)
+        with open(src_path, encoding=encoding) as src, open(dst_path, 'w', encoding=encoding) as dst:
+            for piece in self.iter_replace_chunks(iter(lambda: src.read(chunk_size), '')):
+                dst.write(piece)
+
+    def _iter_matches(self, string):
+        if self.regex:
+            return ((match.start(), match.end(), match.group(0)) for match in self.regex.finditer(string))
+        elif self.kwtree:
+            return _iter_leftmost_longest(self.kwtree, string, self.max_key_len)
+        else:
+            return iter([])
+
+    def _iter_replaced_automaton(self, string):
+        substitutions = self.substitutions
+        prev_end = 0
+        for start, end, key in _iter_leftmost_longest(self.kwtree, string, self.max_key_len):
+            yield string[prev_end:start]
+            yield substitutions[key]
+            prev_end = end
+        yield string[prev_end:]
+
+
+def get_multi_replacer(substitutions, backend='trie') -> MultiReplacer:
+    """substitutions 와 내용이 같은 캐시된 MultiReplacer 를 돌려준다
+
+    id 로 찾고, MultiReplacer 가 복사해 둔 mapping 과 == 로 비교해서 제자리에서 고친 것 (값, key 변경) 도 알아챈다.
+    비교는 mapping 크기에 비례하지만 hash 나 다시 컴파일하는 것보다 훨씬 싸다. 캐시가 substitutions 를 참조하므로 id 는 재사용되지 않는다.
     """
-    substrings = sorted(substitutions, key=len, reverse=True)
-    regex = re.compile('|'.join(map(re.escape, substrings)))
-    return regex.sub(lambda match: substitutions[match.group(0)], string)
+    key = (id(substitutions), backend)
+    cached = _multi_replacer_cache.get(key)
+    if cached and cached[0] is substitutions and cached[1].substitutions == substitutions:
+        _multi_replacer_cache.move_to_end(key)
+        return cached[1]
+
+    replacer = MultiReplacer(substitutions, backend=backend)
+    _multi_replacer_cache[key] = (substitutions, replacer)
+    while len(_multi_replacer_cache) > MULTI_REPLACER_CACHE_SIZE:
+        _multi_replacer_cache.popitem(last=False)
+    return replacer
 
 
 try:
@@ -111,3 +509,67 @@ def remove_4byte_unicode(text):
     """4byte unicode 제거 """
     return high_points.sub('', text)
 
+
+_surrogate_pairs = re.compile('[\uD800-\uDBFF][\uDC00-\uDFFF]')
+
+
+def iter_remove_4byte_unicode(chunks: Iterable[str]) -> Iterator[str]:
+    """chunk 단위 remove_4byte_unicode, chunk 끝에 걸린 high surrogate 는 다음 chunk 와 합쳐서 처리한다"""
+    carry = ''
+    for chunk in chunks:
+        chunk = carry + chunk
+        carry = ''
+        if chunk and '\uD800' <= chunk[-1] <= '\uDBFF':
+            chunk, carry = chunk[:-1], chunk[-1]
+        yield _surrogate_pairs.sub('', high_points.sub('', chunk))
+    if carry:
+        yield carry
+
+
+def iter_multi_replace(chunks: Iterable[str], substitutions, backend='trie') -> Iterator[str]:
+    return get_multi_replacer(substitutions, backend=backend).iter_replace_chunks(chunks)
+
+
+def iter_normalize_text(chunks: Iterable[str], substitutions=None, remove_4byte=True, norm_ws=True) -> Iterator[str]:
+    """remove_4byte_unicode -> norm_whitespace -> multi_replace 를 chunk 단위 generator 로 이어 붙인다
+
+    각 단계는 chunk 경계에 걸친 surrogate pair, whitespace 연속, 치환 key 를 스스로 처리한다.
+    """
+    if remove_4byte:
+        chunks = iter_remove_4byte_unicode(chunks)
+    if norm_ws:
+        chunks = iter_norm_whitespace(chunks)
+    if substitutions:
+        chunks = iter_multi_replace(chunks, substitutions)
+    return chunks
+
+
+def iter_decode(byte_chunks: Iterable[bytes], encoding='utf8', errors='strict') -> Iterator[str]:
+    """byte chunk 들을 decode 한다, chunk 경계에서 잘린 multibyte 문자는 다음 chunk 와 합쳐서 decode 한다"""
+    decoder = codecs.getincrementaldecoder(encoding)(errors=errors)
+    for byte_chunk in byte_chunks:
+        yield decoder.decode(byte_chunk)
+    yield decoder.decode(b'', final=True)
+
+
+def normalize_file(src_path, dst_path, substitutions=None, remove_4byte=True, norm_ws=True,
+                   chunk_size=1 << 20, encoding='utf8'):
+    """파일 전체를 메모리에 올리지 않고 iter_normalize_text 를 적용해서 dst_path 에 쓴다"""
+    make_parent_dir(dst_path)
+    with open(src_path, 'rb') as src, open(dst_path, 'w', encoding=encoding) as dst:
+        chunks = iter_decode(iter(lambda: src.read(chunk_size), b''), encoding=encoding)
+        for piece in iter_normalize_text(chunks, substitutions, remove_4byte=remove_4byte, norm_ws=norm_ws):
+            dst.write(piece)
+
+
+def normalize_files(path_pairs, workers=None, **kwargs):
+    """[(src_path, dst_path), ...] 를 normalize_file 한다, workers 가 주어지면 파일 단위로 process pool 에서 나눠 처리한다"""
+    path_pairs = list(path_pairs)
+    if not workers or workers <= 1:
+        for src_path, dst_path in path_pairs:
+            normalize_file(src_path, dst_path, **kwargs)
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        pool.starmap(partial(normalize_file, **kwargs), path_pairs)
+
@@ -2,10 +2,11 @@ import logging
 import os
 from os.path import join as pjoin
 import pickle
+import re
 from contextlib import contextmanager
 from urllib.parse import urlsplit, urlunsplit, parse_qs, urljoin
 from subprocess import check_output, STDOUT, CalledProcessError
-from typing import Sequence, Callable, TypeVar, Iterator, Tuple, List
+from typing import Sequence, Callable, TypeVar, Iterator, Iterable, Tuple, List
 from collections import deque
 
 U = TypeVar('U')
@@ -143,6 +144,26 @@ def norm_whitespace(text):
     return ' '.join(text.split())
 
 
+def iter_norm_whitespace(chunks: Iterable[str]) -> Iterator[str]:
+    """chunk 들을 이어붙인 문자열에 norm_whitespace 를 한 것과 같은 결과를 조각으로 yield 한다
+
+    chunk 경계에 걸친 whitespace 연속은 하나의 공백이 되고, 경계에서 이어지는 단어는 붙인다.
+    """
+    started = False
+    pending_space = False
+    for chunk in chunks:
+        if not chunk:
+            continue
+        words = chunk.split()
+        if not words:
+            pending_space = started
+            continue
+        prefix = ' ' if started and (pending_space or chunk[0].isspace()) else ''
+        yield prefix + ' '.join(words)
+        started = True
+        pending_space = chunk[-1].isspace()
+
+
 def flat_text_with_sep(texts_list, sep1='\t', sep2='\n'):
     """[['a', 'b'], ['c', 'd']] 와 같은 구조로 된 데이터를 sep 를 사용하여 하나의 문자열로 푼다
 
@@ -152,6 +173,37 @@ def flat_text_with_sep(texts_list, sep1='\t', sep2='\n'):
     return sep2.join(sep1.join(texts) for texts in norm_texts_list)
 
 
+_not_norm_whitespace = re.compile(r'[^\S ]|  |^ | $')
+
+
+def fast_norm_whitespace(text):
+    """norm_whitespace 와 같은 결과, 이미 정규화된 문자열은 새로 만들지 않고 그대로 돌려준다"""
+    if _not_norm_whitespace.search(text):
+        return ' '.join(text.split())
+    return text
+
+
+def write_flat_text_with_sep(texts_iter, file, sep1='\t', sep2='\n', buffer_size=1 << 20, encoding='utf8'):
+    """flat_text_with_sep 과 같은 내용을 한 행씩 file 에 쓴다, 중간 list 나 전체 문자열을 만들지 않는다
+
+    :param texts_iter: 행(문자열 목록)의 iterable, generator 도 된다
+    :param file: 파일 경로 또는 write 가 있는 객체 (파일, socket.makefile('w') 등)
+    :return: 쓴 행의 수
+    """
+    if not hasattr(file, 'write'):
+        make_parent_dir(file)
+        with open(file, 'w', encoding=encoding, buffering=buffer_size) as f:
+            return write_flat_text_with_sep(texts_iter, f, sep1=sep1, sep2=sep2)
+
+    write = file.write
+    num_rows = 0
+    for texts in texts_iter:
+        line = sep1.join([fast_norm_whitespace(text) for text in texts])
+        write(sep2 + line if num_rows else line)
+        num_rows += 1
+    return num_rows
+
+
 def do_nothing(*args, **kwargs):
     """호출되어도 아무것도 하지 않는 함수"""
 